@@ -0,0 +1,487 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark harness for csv_to_dataverse_json
+Generates synthetic CSVs from the TEMPLATE_CSV_WITH_ALL_COLUMNS.csv headers
+(plus geospatial, social science and files columns), converts them and reports
+rows/sec, per-row latency percentiles, peak RSS and output size as JSON.
+With --memory it measures memory per converted dataset, and with --io it compares read/write time and bytes on disk for compressed
+and columnar inputs and compressed outputs against plain text.
+"""
+
+import os
+import sys
+import csv
+import json
+import random
+import platform
+import argparse
+import resource
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+TEMPLATE_CSV = os.path.join(HERE, 'TEMPLATE_CSV_WITH_ALL_COLUMNS.csv')
+
+# Columns added on top of the template header
+EXTRA_COLUMNS = [
+    'geographicCoverage', 'geographicUnit',
+    'unitOfAnalysis', 'universe', 'timeMethod', 'samplingProcedure', 'collectionMode', 'weighting',
+    'files', 'citation'
+]
+
+WORDS = ['survey', 'census', 'health', 'labour', 'income', 'climate', 'housing', 'education',
+         'migration', 'energy', 'water', 'transport', 'population', 'trade', 'crime', 'ageing']
+NAMES = ['Smith, Jane', 'Tremblay, Marc', 'Nguyen, Linh', 'Cevik, Zeynep', 'Roy, Anne', 'Singh, Amar']
+PLACES = ['University of Toronto', 'McGill University', 'Statistics Canada', 'UBC', 'Dalhousie University']
+SUBJECTS = ['Social Sciences', 'Medicine, Health and Life Sciences', 'Earth and Environmental Sciences',
+            'Computer and Information Science', 'Arts and Humanities']
+COUNTRIES = ['Canada', 'United States', 'France', 'Germany', 'Japan', 'Brazil']
+
+
+def template_columns(template_path=TEMPLATE_CSV):
+    """Column names of the template, without the ': subfield; ...' hints, plus EXTRA_COLUMNS."""
+    with open(template_path, newline='', encoding='utf-8') as f:
+        header = next(csv.reader(f))
+    columns = [col.split(':')[0].strip() for col in header]
+    return columns + [col for col in EXTRA_COLUMNS if col not in columns]
+
+
+def _compound_value(rng, subfields, max_entries=3):
+    """`a; b | a; b` style value with one realistic part per subfield."""
+    entries = []
+    for _ in range(rng.randint(1, max_entries)):
+        parts = []
+        for name in subfields:
+            lowered = name.lower()
+            if 'email' in lowered:
+                parts.append(f"{rng.choice(WORDS)}@example.org")
+            elif 'affiliation' in lowered:
+                parts.append(rng.choice(PLACES))
+            elif 'url' in lowered or 'uri' in lowered:
+                parts.append(f"https://example.org/{rng.choice(WORDS)}")
+            elif 'date' in lowered or 'start' in lowered or 'end' in lowered:
+                parts.append(f"{rng.randint(1990, 2025)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}")
+            elif 'name' in lowered:
+                parts.append(rng.choice(NAMES))
+            else:
+                parts.append(' '.join(rng.sample(WORDS, 2)))
+        entries.append('; '.join(parts))
+    return ' | '.join(entries)
+
+
+def _files_value(rng, row_number):
+    files = [{
+        "label": f"data_{row_number}_{i}.csv",
+        "restricted": False,
+        "directoryLabel": "data",
+        "dataFile": {
+            "contentType": "text/csv",
+            "filesize": rng.randint(1000, 10 ** 8),
+            "checksum": {"type": "MD5", "value": '%032x' % rng.getrandbits(128)}
+        }
+    } for i in range(rng.randint(1, 3))]
+    return json.dumps(files)
+
+
+def synthetic_row(rng, row_number, columns):
+    """Build one synthetic CSV row (a dict) for the given columns."""
+    from csv_to_dataverse_json import CITATION_DIRECTORY, COMPOUND_FIELDS
+
+    row = {}
+    for col in columns:
+        if col == 'id':
+            value = str(10000 + row_number)
+        elif col == 'identifier':
+            value = f"FK2/SYN{row_number:07d}"
+        elif col == 'protocol':
+            value = 'doi'
+        elif col == 'authority':
+            value = '10.70122'
+        elif col in ('publicationDate', 'productionDate', 'distributionDate', 'dateOfDeposit'):
+            value = f"{rng.randint(1990, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        elif col in ('versionNumber', 'versionMinorNumber'):
+            value = str(rng.randint(0, 3))
+        elif col == 'fileAccessRequest':
+            value = rng.choice(['true', 'false'])
+        elif col == 'geographicCoverage':
+            # A compound field too, but filled with real countries (the first subfield)
+            value = ' | '.join(rng.sample(COUNTRIES, rng.randint(1, 3)))
+        elif col in COMPOUND_FIELDS:
+            value = _compound_value(rng, COMPOUND_FIELDS[col])
+        elif col in ('subject', 'language'):
+            pool = SUBJECTS if col == 'subject' else ['English', 'French', 'German']
+            value = ' | '.join(rng.sample(pool, rng.randint(1, 2)))
+        elif col == 'files':
+            value = _files_value(rng, row_number)
+        elif col == 'citation':
+            value = f"{rng.choice(NAMES)} ({rng.randint(1990, 2025)}). {rng.choice(WORDS).title()} dataset."
+        elif CITATION_DIRECTORY.get(col, {}).get('multiple'):
+            value = ' | '.join(' '.join(rng.sample(WORDS, 2)) for _ in range(rng.randint(1, 3)))
+        elif col in ('licenseName', 'licenseUri', 'licenseIconUri', 'rightsIdentifier',
+                     'rightsIdentifierScheme', 'schemeUri', 'languageCode', 'datasetType',
+                     'versionState', 'latestVersionPublishingState', 'publisher'):
+            value = ''  # leave to the converter defaults
+        else:
+            value = f"{rng.choice(WORDS).title()} {' '.join(rng.sample(WORDS, 3))}"
+
+        # Leave some optional cells blank so placeholder paths run too
+        if col not in ('id', 'identifier', 'title') and rng.random() < 0.1:
+            value = ''
+        row[col] = value
+    return row
+
+
+def generate_synthetic_csv(path, rows, seed=42, columns=None):
+    """Write a synthetic CSV with `rows` rows; returns the path."""
+    columns = columns or template_columns()
+    rng = random.Random(seed)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        for row_number in range(rows):
+            writer.writerow(synthetic_row(rng, row_number, columns))
+    return path
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+def measure_row_latencies(csv_path, max_rows, engine='pandas'):
+    """
+    Time the conversion of each of up to `max_rows` rows read with `engine`
+    (the converter's internal _build_dataset); returns latencies in microseconds.
+    """
+    import csv_to_dataverse_json as conv
+
+    timestamps = conv.conversion_timestamps()
+    latencies = []
+    chunk = next(conv.iter_csv_chunks(csv_path, chunksize=max_rows, stream=True, engine=engine), None)
+    if chunk is None:
+        return latencies
+    columns = list(chunk.columns)
+    plan = conv.compile_conversion_plan(tuple(columns))
+    values = chunk.values
+    if isinstance(chunk, conv.RecordChunk):
+        prepared_rows = [None] * len(values)
+    else:
+        prepared_rows = conv.normalize_chunk(values, columns, plan, timestamps['current_year'])
+    for idx, row_values, prepared in zip(chunk.index, values, prepared_rows):
+        row = dict(zip(columns, row_values))
+        start = time.perf_counter()
+        conv._build_dataset(row, idx, None, timestamps, plan, prepared)
+        latencies.append((time.perf_counter() - start) * 1e6)
+    return latencies
+
+
+def run_single(csv_path, output_path, convert_kwargs, latency_rows):
+    """Convert one CSV in this process and return its measurements."""
+    import csv_to_dataverse_json as conv
+
+    devnull = open(os.devnull, 'w')
+    stdout = sys.stdout
+    sys.stdout = devnull
+    try:
+        start = time.perf_counter()
+        # As the command line runs it: the converted datasets are not returned
+        conv.csv_to_dataverse_json(csv_path, output_path, return_datasets=False, **convert_kwargs)
+        elapsed = time.perf_counter() - start
+        # Taken before the latency pass so it reflects the conversion alone
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        latencies = sorted(measure_row_latencies(csv_path, latency_rows, convert_kwargs.get('engine', 'pandas')))
+    finally:
+        sys.stdout = stdout
+        devnull.close()
+
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        rows = sum(1 for _ in csv.reader(f)) - 1
+
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak_rss_mb = max_rss / (1024 * 1024) if sys.platform == 'darwin' else max_rss / 1024
+    return {
+        'rows': rows,
+        'seconds': round(elapsed, 4),
+        'rows_per_sec': round(rows / elapsed, 1) if elapsed else None,
+        'latency_us': {
+            'sampled_rows': len(latencies),
+            'p50': round(percentile(latencies, 50), 2),
+            'p90': round(percentile(latencies, 90), 2),
+            'p99': round(percentile(latencies, 99), 2),
+            'max': round(latencies[-1], 2) if latencies else 0.0
+        },
+        'peak_rss_mb': round(peak_rss_mb, 1),
+        'input_bytes': os.path.getsize(csv_path),
+        'output_bytes': os.path.getsize(output_path)
+    }
+
+
+def measure_startup(workdir, runs=10, seed=42):
+    """
+    Wall time of converting a one-row CSV in a fresh interpreter, per engine.
+    Returns {engine: {'median_ms', 'min_ms'}}.
+    """
+    csv_path = os.path.join(workdir, f"synthetic_1_{seed}.csv")
+    if not os.path.exists(csv_path):
+        generate_synthetic_csv(csv_path, 1, seed=seed)
+    output_path = os.path.join(workdir, 'output_startup.json')
+    script = os.path.join(HERE, 'csv_to_dataverse_json.py')
+
+    startup = {}
+    for engine in ('pandas', 'csv'):
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, script, csv_path, output_path, '--engine', engine],
+                           stdout=subprocess.DEVNULL, check=True)
+            times.append((time.perf_counter() - start) * 1000)
+        times.sort()
+        startup[engine] = {'median_ms': round(times[len(times) // 2], 1), 'min_ms': round(times[0], 1)}
+        print(f"✓ Startup ({engine} engine, one-row CSV): median {startup[engine]['median_ms']} ms")
+    return startup
+
+
+def write_io_variants(csv_path, workdir):
+    """
+    Write `csv_path` as .gz/.bz2/.xz/.zst (zstd if installed) and as Parquet
+    (if pyarrow is installed, all columns as strings, blank cells as nulls).
+    Returns {label: path}, plain CSV first.
+    """
+    from file_formats import COMPRESSION_CHOICES, open_binary
+
+    stem = os.path.join(workdir, os.path.splitext(os.path.basename(csv_path))[0])
+    suffixes = {'gzip': '.gz', 'bz2': '.bz2', 'xz': '.xz', 'zstd': '.zst'}
+    variants = {'csv': csv_path}
+    for compression in COMPRESSION_CHOICES:
+        path = f"{stem}.csv{suffixes[compression]}"
+        try:
+            if not os.path.exists(path):
+                with open(csv_path, 'rb') as src, open_binary(path, 'wb', compression) as dst:
+                    for block in iter(lambda: src.read(1 << 20), b''):
+                        dst.write(block)
+        except ValueError as e:
+            print(f"⚠ Skipping {compression}: {e}")
+            continue
+        variants[f"csv.{compression}"] = path
+
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("⚠ Skipping parquet: pyarrow is not installed")
+        return variants
+    path = f"{stem}.parquet"
+    if not os.path.exists(path):
+        with open(csv_path, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            columns = list(zip(*reader)) or [()] * len(header)
+        pq.write_table(pa.table({col: pa.array([cell or None for cell in cells], pa.string())
+                                 for col, cells in zip(header, columns)}), path)
+    variants['parquet'] = path
+    return variants
+
+
+def measure_io(csv_path, workdir, engine='pandas'):
+    """
+    Read time and bytes on disk per input format (all chunks through
+    iter_csv_chunks), and write time and bytes per output compression (the
+    converted datasets through write_datasets_stream, as JSON and JSON Lines).
+    """
+    import csv_to_dataverse_json as conv
+    from file_formats import COMPRESSION_CHOICES
+
+    inputs = {}
+    for label, path in write_io_variants(csv_path, workdir).items():
+        start = time.perf_counter()
+        rows = sum(len(chunk) for chunk in conv.iter_csv_chunks(path, chunksize=1000, stream=True, engine=engine))
+        elapsed = time.perf_counter() - start
+        inputs[label] = {'read_seconds': round(elapsed, 4), 'bytes': os.path.getsize(path), 'rows': rows}
+        print(f"✓ Read {label:<10} {elapsed:>8.3f}s {inputs[label]['bytes']:>12} bytes")
+
+    devnull = open(os.devnull, 'w')
+    stdout = sys.stdout
+    sys.stdout = devnull
+    try:
+        datasets = list(conv.iter_dataverse_datasets(csv_path, engine=engine))
+    finally:
+        sys.stdout = stdout
+        devnull.close()
+
+    suffixes = {'gzip': '.gz', 'bz2': '.bz2', 'xz': '.xz', 'zstd': '.zst'}
+    outputs = {}
+    for output_format in ('json', 'jsonl'):
+        for compression in (None,) + COMPRESSION_CHOICES:
+            label = output_format if compression is None else f"{output_format}.{compression}"
+            path = os.path.join(workdir, f"output_io.{output_format}{suffixes.get(compression, '')}")
+            start = time.perf_counter()
+            try:
+                conv.write_datasets_stream(datasets, path, output_format, compression=compression)
+            except ValueError as e:
+                print(f"⚠ Skipping {label}: {e}")
+                continue
+            elapsed = time.perf_counter() - start
+            outputs[label] = {'write_seconds': round(elapsed, 4), 'bytes': os.path.getsize(path)}
+            print(f"✓ Write {label:<11} {elapsed:>7.3f}s {outputs[label]['bytes']:>12} bytes")
+    return {'engine': engine, 'inputs': inputs, 'outputs': outputs}
+
+
+def measure_dataset_memory(csv_path, max_rows=5000, engine='pandas'):
+    """
+    Bytes held per converted dataset (tracemalloc), for the compact Field
+    representation and for the same datasets as plain dicts (the layout
+    json.loads gives, and what the converter built before Fields).
+    """
+    import csv_to_dataverse_json as conv
+    from metadata_fields import to_plain
+
+    chunk = next(conv.iter_csv_chunks(csv_path, chunksize=max_rows, stream=True, engine=engine))
+    timestamps = conv.conversion_timestamps()
+
+    def held_bytes(convert):
+        tracemalloc.start()
+        try:
+            datasets = [convert(dataset_json) for _, dataset_json in conv._convert_chunk(chunk, None, timestamps)]
+            held = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        return held, len(datasets)
+
+    devnull = open(os.devnull, 'w')
+    stdout = sys.stdout
+    sys.stdout = devnull
+    try:
+        conv._convert_chunk(chunk, None, timestamps)  # fill plan, regex and field type caches first
+        compact, rows = held_bytes(lambda dataset_json: dataset_json)
+        plain, _ = held_bytes(to_plain)
+    finally:
+        sys.stdout = stdout
+        devnull.close()
+
+    memory = {
+        'rows': rows,
+        'compact_bytes_per_dataset': round(compact / rows) if rows else 0,
+        'dict_bytes_per_dataset': round(plain / rows) if rows else 0,
+        'saved_pct': round((1 - compact / plain) * 100, 1) if plain else 0.0
+    }
+    print(f"✓ Memory per dataset ({rows} rows): {memory['compact_bytes_per_dataset']} bytes compact, "
+          f"{memory['dict_bytes_per_dataset']} bytes as dicts ({memory['saved_pct']}% less)")
+    return memory
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(current, previous_path):
+    """Print rows/sec, p50 latency and peak RSS changes against a previous results file."""
+    with open(previous_path, encoding='utf-8') as f:
+        previous = json.load(f)
+    before = {r['rows']: r for r in previous.get('results', [])}
+    print(f"\nCompared with {previous_path} (commit {previous.get('commit')}):")
+    for result in current['results']:
+        old = before.get(result['rows'])
+        if not old:
+            continue
+        speed = (result['rows_per_sec'] / old['rows_per_sec'] - 1) * 100 if old['rows_per_sec'] else 0.0
+        print(f"  {result['rows']:>9} rows: rows/sec {old['rows_per_sec']} -> {result['rows_per_sec']} ({speed:+.1f}%), "
+              f"p50 {old['latency_us']['p50']} -> {result['latency_us']['p50']} us, "
+              f"peak RSS {old['peak_rss_mb']} -> {result['peak_rss_mb']} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark csv_to_dataverse_json on synthetic CSVs')
+    parser.add_argument('--sizes', default='1000,100000,1000000', help='Comma-separated row counts (default: 1000,100000,1000000)')
+    parser.add_argument('--workdir', default='bench_data', help='Directory for generated CSVs and outputs')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for the synthetic data')
+    parser.add_argument('--results', default='bench_results.json', help='Where to save the results JSON')
+    parser.add_argument('--compare', help='Previous results JSON to compare against')
+    parser.add_argument('--latency-rows', dest='latency_rows', type=int, default=20000,
+                        help='Rows sampled for per-row latency percentiles (default: 20000)')
+    parser.add_argument('--stream', action='store_true', help='Benchmark the streaming writer')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes for the conversion')
+    parser.add_argument('--json-backend', dest='json_backend', default='stdlib', help='JSON backend to benchmark')
+    parser.add_argument('--compact', action='store_true', help='Benchmark compact JSON output')
+    parser.add_argument('--engine', choices=['pandas', 'csv'], default='pandas', help='CSV reader engine to benchmark')
+    parser.add_argument('--startup', action='store_true', help='Also measure one-row startup time for both engines')
+    parser.add_argument('--memory', action='store_true',
+                        help='Also measure memory per converted dataset, compact fields vs plain dicts (first size)')
+    parser.add_argument('--io', action='store_true',
+                        help='Also compare compressed/Parquet input and compressed output with plain text (first size)')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    convert_kwargs = {'stream': args.stream, 'workers': args.workers, 'engine': args.engine,
+                      'json_backend': args.json_backend, 'indent': None if args.compact else 2}
+
+    if args.child:
+        # Run one size in a fresh interpreter so peak RSS belongs to that size alone
+        csv_path, output_path = args.child.split(os.pathsep)
+        print(json.dumps(run_single(csv_path, output_path, convert_kwargs, args.latency_rows)))
+        return
+
+    os.makedirs(args.workdir, exist_ok=True)
+    results = []
+    for size in [int(s) for s in args.sizes.split(',') if s.strip()]:
+        csv_path = os.path.join(args.workdir, f"synthetic_{size}_{args.seed}.csv")
+        if not os.path.exists(csv_path):
+            print(f"Generating {size} rows -> {csv_path}")
+            generate_synthetic_csv(csv_path, size, seed=args.seed)
+        output_path = os.path.join(args.workdir, f"output_{size}.json")
+
+        child_args = [sys.executable, os.path.abspath(__file__), '--child', os.pathsep.join([csv_path, output_path]),
+                      '--latency-rows', str(args.latency_rows), '--json-backend', args.json_backend,
+                      '--engine', args.engine]
+        if args.stream:
+            child_args.append('--stream')
+        if args.workers:
+            child_args += ['--workers', str(args.workers)]
+        if args.compact:
+            child_args.append('--compact')
+        result = json.loads(subprocess.check_output(child_args).decode().strip().splitlines()[-1])
+        results.append(result)
+        print(f"✓ {result['rows']} rows: {result['rows_per_sec']} rows/sec, "
+              f"p50 {result['latency_us']['p50']} us, p99 {result['latency_us']['p99']} us, "
+              f"peak RSS {result['peak_rss_mb']} MB, output {result['output_bytes']} bytes")
+
+    import pandas as pd
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'options': convert_kwargs,
+        'seed': args.seed,
+        'results': results
+    }
+    if args.startup:
+        report['startup'] = measure_startup(args.workdir, seed=args.seed)
+    if args.memory:
+        size = int(args.sizes.split(',')[0])
+        report['memory'] = measure_dataset_memory(os.path.join(args.workdir, f"synthetic_{size}_{args.seed}.csv"),
+                                                  engine=args.engine)
+    if args.io:
+        size = int(args.sizes.split(',')[0])
+        report['io'] = measure_io(os.path.join(args.workdir, f"synthetic_{size}_{args.seed}.csv"),
+                                  args.workdir, engine=args.engine)
+    with open(args.results, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Results saved to {args.results}")
+
+    if args.compare:
+        compare_results(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+"""
+Long-running conversion service.
+Keeps csv_to_dataverse_json loaded in a pool of warm worker processes and
+converts CSV payloads sent over a local HTTP socket (TCP on 127.0.0.1 or a
+Unix socket) or dropped into an inbox directory. Requests wait in a bounded
+queue; when it is full, new ones are turned away instead of piling up.
+Per-request queue and conversion latencies are kept for /metrics.
+"""
+
+import argparse
+import io
+import json
+import os
+import signal
+import socketserver
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from csv_to_dataverse_json import JsonSerializer, iter_dataverse_datasets, write_datasets_stream
+
+
+class ServiceBusy(Exception):
+    """The work queue is full."""
+
+
+def _warm_worker(engine):
+    """Pool initializer: pay for the heavy imports once per worker process."""
+    if engine == 'pandas':
+        import pandas  # noqa: F401
+
+
+def convert_payload(csv_text, defaults=None, engine='csv', output_format='json', json_backend='stdlib', indent=2):
+    """
+    Convert CSV text held in memory and return (json_bytes, rows, started, finished).
+    The JSON has the same layout as the file output; times are time.monotonic().
+    """
+    started = time.monotonic()
+    datasets = iter_dataverse_datasets(io.StringIO(csv_text), defaults, engine=engine)
+    out = io.BytesIO()
+    rows = write_datasets_stream(datasets, out, output_format, JsonSerializer(json_backend, indent))
+    return out.getvalue(), rows, started, time.monotonic()
+
+
+def _percentile(ordered, fraction):
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 2)
+
+
+class LatencyStats:
+    """Thread-safe request counters plus the latencies of the last `window` requests."""
+
+    def __init__(self, window=10000):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.rejected = 0
+        self.rows = 0
+        self._queue_ms = deque(maxlen=window)
+        self._convert_ms = deque(maxlen=window)
+        self._total_ms = deque(maxlen=window)
+
+    def record(self, queue_ms, convert_ms, total_ms, rows):
+        with self._lock:
+            self.requests += 1
+            self.rows += rows
+            self._queue_ms.append(queue_ms)
+            self._convert_ms.append(convert_ms)
+            self._total_ms.append(total_ms)
+
+    def record_error(self):
+        with self._lock:
+            self.requests += 1
+            self.errors += 1
+
+    def record_rejected(self):
+        with self._lock:
+            self.rejected += 1
+
+    def snapshot(self):
+        with self._lock:
+            latencies = {name: sorted(values) for name, values in
+                         (('queue_ms', self._queue_ms), ('convert_ms', self._convert_ms), ('total_ms', self._total_ms))}
+            report = {'requests': self.requests, 'errors': self.errors, 'rejected': self.rejected, 'rows': self.rows}
+        for name, ordered in latencies.items():
+            report[name] = {'p50': _percentile(ordered, 0.50), 'p95': _percentile(ordered, 0.95),
+                            'p99': _percentile(ordered, 0.99), 'max': round(ordered[-1], 2) if ordered else None}
+        return report
+
+
+class ConversionService:
+    """
+    A warm worker pool behind a bounded queue. At most `workers` conversions
+    run at once and `queue_size` more may wait; submit() raises ServiceBusy
+    beyond that unless `block` is set.
+    """
+
+    def __init__(self, workers=2, queue_size=64, engine='csv', defaults=None, json_backend='stdlib', indent=2):
+        self.engine = engine
+        self.defaults = defaults or {}
+        self.json_backend = json_backend
+        self.indent = indent
+        self.metrics = LatencyStats()
+        self.started = time.time()
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._executor = ProcessPoolExecutor(max_workers=workers, initializer=_warm_worker, initargs=(engine,))
+        # Start every worker now, before any server threads exist
+        for future in [self._executor.submit(time.sleep, 0.05) for _ in range(workers)]:
+            future.result()
+
+    def submit(self, csv_text, output_format='json', defaults=None, block=False):
+        """Queue one conversion; the future resolves to (json_bytes, rows, timings)."""
+        if not self._slots.acquire(blocking=block):
+            self.metrics.record_rejected()
+            raise ServiceBusy()
+        submitted = time.monotonic()
+        try:
+            future = self._executor.submit(convert_payload, csv_text, {**self.defaults, **(defaults or {})},
+                                           self.engine, output_format, self.json_backend, self.indent)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        result = Future()
+
+        def done(f):
+            self._slots.release()
+            finished = time.monotonic()
+            try:
+                body, rows, started, converted = f.result()
+            except Exception as e:
+                self.metrics.record_error()
+                result.set_exception(e)
+                return
+            timings = {'queue_ms': (started - submitted) * 1000, 'convert_ms': (converted - started) * 1000,
+                       'total_ms': (finished - submitted) * 1000}
+            self.metrics.record(timings['queue_ms'], timings['convert_ms'], timings['total_ms'], rows)
+            result.set_result((body, rows, timings))
+
+        future.add_done_callback(done)
+        return result
+
+    def convert(self, csv_text, output_format='json', defaults=None, block=False):
+        return self.submit(csv_text, output_format, defaults, block).result()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """POST /convert (CSV body), GET /metrics, GET /health."""
+
+    protocol_version = 'HTTP/1.1'
+    service = None
+
+    def address_string(self):
+        return self.client_address[0] if self.client_address else 'local'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type='application/json', headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, obj, headers=None):
+        self._send(status, json.dumps(obj).encode('utf-8'), headers=headers)
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == '/metrics':
+            report = self.service.metrics.snapshot()
+            report['uptime_seconds'] = round(time.time() - self.service.started, 1)
+            self._send_json(200, report)
+        elif path == '/health':
+            self._send_json(200, {'status': 'OK'})
+        else:
+            self._send_json(404, {'status': 'ERROR', 'message': 'Not found'})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if url.path != '/convert':
+            self._send_json(404, {'status': 'ERROR', 'message': 'Not found'})
+            return
+
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        defaults = {key: query[key] for key in ('author', 'email', 'description') if query.get(key)}
+        output_format = 'jsonl' if query.get('format') == 'jsonl' else 'json'
+        try:
+            data, rows, timings = self.service.convert(body.decode('utf-8-sig'), output_format, defaults)
+        except ServiceBusy:
+            self._send_json(503, {'status': 'ERROR', 'message': 'Conversion queue is full'}, {'Retry-After': '1'})
+        except Exception as e:
+            self._send_json(400, {'status': 'ERROR', 'message': f"{type(e).__name__}: {e}"})
+        else:
+            self._send(200, data, 'application/x-ndjson' if output_format == 'jsonl' else 'application/json', {
+                'X-Rows': str(rows),
+                'X-Queue-Ms': f"{timings['queue_ms']:.2f}",
+                'X-Convert-Ms': f"{timings['convert_ms']:.2f}"
+            })
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(service, host='127.0.0.1', port=8787, unix_socket=None):
+    """HTTP server for `service` on a TCP port or, with `unix_socket`, on a Unix socket path."""
+    handler = type('RequestHandler', (_RequestHandler,), {'service': service})
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        return ThreadingUnixHTTPServer(unix_socket, handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def _move(path, directory):
+    os.makedirs(directory, exist_ok=True)
+    target = os.path.join(directory, os.path.basename(path))
+    os.replace(path, target)
+    return target
+
+
+def watch_inbox(service, inbox, outbox=None, interval=0.5, stop=None, log=print):
+    """
+    Convert every *.csv that appears in `inbox` into `outbox` (default: inbox/out).
+    Write the CSV under another name and rename it to .csv when it is complete.
+    Converted files move to inbox/done, failed ones to inbox/failed with the
+    error next to them.
+    """
+    outbox = outbox or os.path.join(inbox, 'out')
+    processing, done_dir, failed_dir = (os.path.join(inbox, name) for name in ('processing', 'done', 'failed'))
+    os.makedirs(outbox, exist_ok=True)
+    stop = stop or threading.Event()
+    pending = set()
+    lock = threading.Lock()
+
+    def failed(csv_path, e):
+        name = os.path.basename(csv_path)
+        _move(csv_path, failed_dir)
+        with open(os.path.join(failed_dir, name + '.error.txt'), 'w', encoding='utf-8') as f:
+            f.write(f"{type(e).__name__}: {e}\n")
+        log(f"⚠ {name}: {type(e).__name__}: {e}")
+
+    def finished(csv_path, future):
+        name = os.path.basename(csv_path)
+        try:
+            data, rows, timings = future.result()
+        except Exception as e:
+            failed(csv_path, e)
+        else:
+            json_path = os.path.join(outbox, os.path.splitext(name)[0] + '.json')
+            with open(json_path + '.tmp', 'wb') as f:
+                f.write(data)
+            os.replace(json_path + '.tmp', json_path)
+            _move(csv_path, done_dir)
+            log(f"✓ {name}: {rows} rows in {timings['total_ms']:.1f} ms "
+                f"(queued {timings['queue_ms']:.1f} ms, converted {timings['convert_ms']:.1f} ms)")
+        with lock:
+            pending.discard(csv_path)
+
+    while not stop.is_set():
+        for name in sorted(os.listdir(inbox)):
+            if not name.endswith('.csv'):
+                continue
+            claimed = _move(os.path.join(inbox, name), processing)
+            try:
+                with open(claimed, 'r', encoding='utf-8-sig') as f:
+                    csv_text = f.read()
+            except (OSError, UnicodeDecodeError) as e:
+                failed(claimed, e)
+                continue
+            with lock:
+                pending.add(claimed)
+            future = service.submit(csv_text, block=True)
+            future.add_done_callback(lambda f, path=claimed: finished(path, f))
+        stop.wait(interval)
+
+    while pending:
+        time.sleep(0.01)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Keep the CSV to Dataverse JSON converter warm and serve conversions')
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--port', type=int, default=8787, help='Serve HTTP on 127.0.0.1:PORT (default: 8787)')
+    source.add_argument('--socket', dest='unix_socket', help='Serve HTTP on this Unix socket path instead')
+    source.add_argument('--inbox', help='Watch this directory for CSV files instead of serving HTTP')
+    parser.add_argument('--outbox', help='Where --inbox writes the JSON files (default: INBOX/out)')
+    parser.add_argument('--workers', type=int, default=2, help='Worker processes (default: 2)')
+    parser.add_argument('--queue-size', dest='queue_size', type=int, default=64,
+                        help='Requests that may wait for a worker before new ones are refused (default: 64)')
+    parser.add_argument('--engine', choices=['pandas', 'csv'], default='csv', help='CSV reader (default: csv)')
+    parser.add_argument('--default-author', dest='default_author', help='Default author name if none provided')
+    parser.add_argument('--default-email', dest='default_email', help='Default contact email if none provided')
+    parser.add_argument('--default-description', dest='default_description', help='Default description if none provided')
+    parser.add_argument('--compact', action='store_true', help='Return JSON without any whitespace')
+
+    args = parser.parse_args()
+
+    defaults = {}
+    if args.default_author:
+        defaults['author'] = args.default_author
+    if args.default_email:
+        defaults['email'] = args.default_email
+    if args.default_description:
+        defaults['description'] = args.default_description
+
+    service = ConversionService(workers=args.workers, queue_size=args.queue_size, engine=args.engine,
+                                defaults=defaults, indent=None if args.compact else 2)
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    # Shut down cleanly on SIGTERM (service managers) as well as Ctrl+C
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        if args.inbox:
+            print(f"✓ Watching {args.inbox} with {args.workers} workers (Ctrl+C to stop)")
+            watch_inbox(service, args.inbox, args.outbox)
+        else:
+            server = make_server(service, port=args.port, unix_socket=args.unix_socket)
+            where = args.unix_socket or f"http://127.0.0.1:{args.port}"
+            print(f"✓ Serving conversions on {where} with {args.workers} workers (Ctrl+C to stop)")
+            server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+        if args.unix_socket and os.path.exists(args.unix_socket):
+            os.remove(args.unix_socket)
+        print(f"✓ {json.dumps(service.metrics.snapshot())}")
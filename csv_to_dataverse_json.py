@@ -6,36 +6,113 @@ with all system fields, metadata blocks, and file information.
 """
 
 import os
+import sys
 import csv
+import io
 import json
 import re
-import pandas as pd
+import stat
+import time
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
+from functools import lru_cache, partial
 import uuid
 import argparse
 
+from file_formats import columnar_format, compression_for_path, detect_compression, open_binary, open_text
+from metadata_blocks import default_registry
+from metadata_fields import Field, encode_field, field_type, to_plain
+
+
+# Bump whenever the JSON produced for a given row changes; invalidates row caches
+CONVERTER_VERSION = '1'
+
+# Cells pandas.read_csv reads as NaN by default; the csv engine maps them to None
+CSV_NA_VALUES = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND',
+    '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+])
+
+
+def is_missing(value):
+    """Scalar equivalent of pandas.isna() that works without importing pandas."""
+    if value is None:
+        return True
+    if isinstance(value, float):
+        return value != value
+    return type(value).__name__ in ('NAType', 'NaTType')
+
+
+class FieldStore:
+    """
+    Metadata block fields indexed by typeName, in insertion order.
+    Lookup, replace and required-field checks are O(1) per field;
+    to_list() gives the Dataverse `fields` list.
+    """
+
+    __slots__ = ('_fields',)
+
+    def __init__(self, fields=()):
+        self._fields = {}
+        for field in fields:
+            self._fields[field['typeName']] = field
+
+    def __contains__(self, type_name):
+        return type_name in self._fields
+
+    def __len__(self):
+        return len(self._fields)
+
+    def get(self, type_name):
+        return self._fields.get(type_name)
+
+    def add(self, field):
+        """Append a field, or replace the entry with the same typeName in place."""
+        self._fields[field['typeName']] = field
+
+    def replace(self, field):
+        """Drop any entry with the same typeName and append the new field last."""
+        self._fields.pop(field['typeName'], None)
+        self._fields[field['typeName']] = field
+
+    def has_value(self, type_name, subfield=None):
+        """True if the field has a value and, for compounds, some entry sets `subfield`."""
+        field = self._fields.get(type_name)
+        if not field or not field.get('value'):
+            return False
+        return subfield is None or any(subfield in v for v in field['value'])
+
+    def to_list(self):
+        return list(self._fields.values())
+
 
 def ensure_required_fields(dataset_json, row, defaults=None):
     """Ensure Dataverse-required fields exist; fill with placeholders if missing."""
     try:
-        citation_fields = dataset_json["datasetVersion"]["metadataBlocks"]["citation"]["fields"]
+        citation = dataset_json["datasetVersion"]["metadataBlocks"]["citation"]
     except Exception:
         return
 
-    def find_field(name):
-        for f in citation_fields:
-            if f.get('typeName') == name:
-                return f
-        return None
+    store = FieldStore(citation["fields"])
+    fill_required_fields(store, row, defaults)
+    citation["fields"] = to_plain(store.to_list())
+
+
+def fill_required_fields(citation_fields, row, defaults=None):
+    """
+    Add placeholder author, contact and description fields to a citation FieldStore.
+    Returns the number of fields that were filled in.
+    """
+    filled = 0
 
     # 1) Author (authorName required)
-    author_field = find_field('author')
-    if not author_field or not author_field.get('value'):
+    if not citation_fields.has_value('author'):
+        filled += 1
         # try pull from depositor or CSV 'author' raw string
         raw_author = None
-        if 'author' in row and not pd.isna(row['author']):
+        if 'author' in row and not is_missing(row['author']):
             raw_author = str(row['author']).split(';')[0].split('|')[0].strip()
-        elif 'depositor' in row and not pd.isna(row['depositor']):
+        elif 'depositor' in row and not is_missing(row['depositor']):
             raw_author = str(row['depositor']).strip()
         else:
             # fallback to provided default author, environment, or generic
@@ -43,36 +120,29 @@ def ensure_required_fields(dataset_json, row, defaults=None):
                           os.getenv('DATAVERSE_DEFAULT_AUTHOR') if os.getenv('DATAVERSE_DEFAULT_AUTHOR') else
                           'Unknown Author')
 
-        new_author = {
-            "typeName": "author",
-            "multiple": True,
-            "typeClass": "compound",
-            "value": [
-                {
-                    "authorName": {"typeName": "authorName", "multiple": False, "typeClass": "primitive", "value": raw_author}
-                }
-            ]
-        }
+        new_author = Field(field_type("author", True, "compound"), [
+            {
+                "authorName": Field(field_type("authorName", False, "primitive"), raw_author)
+            }
+        ])
         # replace or append
-        if author_field:
-            citation_fields.remove(author_field)
-        citation_fields.append(new_author)
+        citation_fields.replace(new_author)
 
     # 2) Dataset contact email (datasetContact -> datasetContactEmail required)
-    contact_field = find_field('datasetContact')
-    if not contact_field or not contact_field.get('value') or not any('datasetContactEmail' in v for v in (contact_field.get('value') or [])):
+    if not citation_fields.has_value('datasetContact', 'datasetContactEmail'):
+        filled += 1
         # try CSV values
         contact_name = None
         contact_email = None
-        if 'datasetContact' in row and not pd.isna(row['datasetContact']):
+        if 'datasetContact' in row and not is_missing(row['datasetContact']):
             parts = [p.strip() for p in str(row['datasetContact']).split(';')]
             if len(parts) >= 1:
                 contact_name = parts[0]
             if len(parts) >= 3:
                 contact_email = parts[2]
-        if not contact_name and 'depositor' in row and not pd.isna(row['depositor']):
+        if not contact_name and 'depositor' in row and not is_missing(row['depositor']):
             contact_name = str(row['depositor']).strip()
-        if not contact_email and 'datasetContactEmail' in row and not pd.isna(row['datasetContactEmail']):
+        if not contact_email and 'datasetContactEmail' in row and not is_missing(row['datasetContactEmail']):
             contact_email = str(row['datasetContactEmail']).strip()
         if not contact_email:
             contact_email = (defaults.get('email') if defaults and defaults.get('email') else
@@ -83,154 +153,461 @@ def ensure_required_fields(dataset_json, row, defaults=None):
                             os.getenv('DATAVERSE_DEFAULT_AUTHOR') if os.getenv('DATAVERSE_DEFAULT_AUTHOR') else
                             'Dataset Contact')
 
-        new_contact = {
-            "typeName": "datasetContact",
-            "multiple": True,
-            "typeClass": "compound",
-            "value": [
-                {
-                    "datasetContactName": {"typeName": "datasetContactName", "multiple": False, "typeClass": "primitive", "value": contact_name},
-                    "datasetContactAffiliation": {"typeName": "datasetContactAffiliation", "multiple": False, "typeClass": "primitive", "value": str(row.get('datasetContactAffiliation','')).strip()},
-                    "datasetContactEmail": {"typeName": "datasetContactEmail", "multiple": False, "typeClass": "primitive", "value": contact_email}
-                }
-            ]
-        }
-        if contact_field:
-            citation_fields.remove(contact_field)
-        citation_fields.append(new_contact)
+        new_contact = Field(field_type("datasetContact", True, "compound"), [
+            {
+                "datasetContactName": Field(field_type("datasetContactName", False, "primitive"), contact_name),
+                "datasetContactAffiliation": Field(field_type("datasetContactAffiliation", False, "primitive"), str(row.get('datasetContactAffiliation','')).strip()),
+                "datasetContactEmail": Field(field_type("datasetContactEmail", False, "primitive"), contact_email)
+            }
+        ])
+        citation_fields.replace(new_contact)
 
     # 3) Description (dsDescription -> dsDescriptionValue required)
-    desc_field = find_field('dsDescription')
-    if not desc_field or not desc_field.get('value') or not any('dsDescriptionValue' in v for v in (desc_field.get('value') or [])):
+    if not citation_fields.has_value('dsDescription', 'dsDescriptionValue'):
+        filled += 1
         desc_text = None
-        if 'dsDescription' in row and not pd.isna(row['dsDescription']):
+        if 'dsDescription' in row and not is_missing(row['dsDescription']):
             desc_text = str(row['dsDescription']).split(';')[0].strip()
-        elif 'citation' in row and not pd.isna(row['citation']):
+        elif 'citation' in row and not is_missing(row['citation']):
             desc_text = str(row['citation']).strip()
         else:
             desc_text = (defaults.get('description') if defaults and defaults.get('description') else
                          os.getenv('DATAVERSE_DEFAULT_DESCRIPTION') if os.getenv('DATAVERSE_DEFAULT_DESCRIPTION') else
                          'No description provided.')
 
-        new_desc = {
-            "typeName": "dsDescription",
-            "multiple": True,
-            "typeClass": "compound",
-            "value": [
-                {
-                    "dsDescriptionValue": {"typeName": "dsDescriptionValue", "multiple": False, "typeClass": "primitive", "value": desc_text}
-                }
-            ]
+        new_desc = Field(field_type("dsDescription", True, "compound"), [
+            {
+                "dsDescriptionValue": Field(field_type("dsDescriptionValue", False, "primitive"), desc_text)
+            }
+        ])
+        citation_fields.replace(new_desc)
+
+    return filled
+
+
+# Field definitions compiled from the metadata-block TSVs in metadatablocks/
+REGISTRY = default_registry()
+
+# Field type directory - defines structure for all citation fields
+CITATION_DIRECTORY = REGISTRY.directory('citation')
+
+# Compound field subfield mappings (all blocks)
+COMPOUND_FIELDS = REGISTRY.compound_fields
+
+# Primitive citation fields reduced to a year
+DATE_FIELDS = tuple(field['name'] for field in REGISTRY.block('citation')['fields']
+                    if field['fieldType'] == 'date' and field['typeClass'] == 'primitive')
+YEAR_PATTERN = r'\b((?:19|20)\d{2})\b'
+
+# Top-level/version/license columns copied as stripped text
+SYSTEM_TEXT_COLUMNS = (
+    'protocol', 'authority', 'publisher', 'publicationDate', 'datasetType',
+    'versionState', 'latestVersionPublishingState', 'UNF', 'lastUpdateTime',
+    'releaseTime', 'createTime', 'citationDate', 'termsOfUse',
+    'citationRequirements', 'conditions', 'termsOfAccess', 'licenseName',
+    'licenseUri', 'licenseIconUri', 'rightsIdentifier', 'rightsIdentifierScheme',
+    'schemeUri', 'languageCode'
+)
+
+# Every column the converter reads; columnar inputs load only these
+INPUT_COLUMNS = frozenset(
+    ('id', 'versionId', 'identifier', 'storageIdentifier', 'versionNumber', 'internalVersionNumber',
+     'versionMinorNumber', 'fileAccessRequest', 'files', 'citation', 'depositor',
+     'datasetContactEmail', 'datasetContactAffiliation')
+    + SYSTEM_TEXT_COLUMNS + tuple(REGISTRY.field_blocks)
+)
+
+
+class ConversionProfiler:
+    """
+    Cumulative per-stage timers and counters for one conversion run.
+    A disabled profiler turns every call into a no-op.
+    """
+
+    _NO_STAGE = nullcontext()
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.timings = {}
+        self.calls = {}
+        self.counters = {}
+        self.started = time.perf_counter()
+
+    def stage(self, name):
+        """Context manager adding the elapsed time of its block to stage `name`."""
+        if not self.enabled:
+            return self._NO_STAGE
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self):
+        return {'timings': dict(self.timings), 'calls': dict(self.calls), 'counters': dict(self.counters)}
+
+    def merge(self, snapshot):
+        """Add the timers and counters of another profiler's snapshot (e.g. from a worker)."""
+        for name, seconds in snapshot['timings'].items():
+            self.timings[name] = self.timings.get(name, 0.0) + seconds
+        for name, calls in snapshot['calls'].items():
+            self.calls[name] = self.calls.get(name, 0) + calls
+        for name, n in snapshot['counters'].items():
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        rows = self.counters.get('rows', 0)
+        return {
+            'elapsed_seconds': round(elapsed, 4),
+            'rows_per_sec': round(rows / elapsed, 1) if elapsed else None,
+            'stages': {name: {'seconds': round(seconds, 4), 'calls': self.calls.get(name, 0)}
+                       for name, seconds in sorted(self.timings.items(), key=lambda item: -item[1])},
+            'counters': dict(sorted(self.counters.items()))
         }
-        if desc_field:
-            citation_fields.remove(desc_field)
-        citation_fields.append(new_desc)
 
-    return
+    def write(self, stats_path):
+        report = self.report()
+        with open(stats_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        return report
 
 
-def csv_to_dataverse_json(csv_file_path, output_json_path, defaults=None):
+NO_PROFILER = ConversionProfiler(enabled=False)
+
+
+class ProgressReporter:
     """
-    Convert CSV file to complete Dataverse JSON format.
-    Includes all top-level fields, datasetVersion, license, and metadata blocks.
+    Rate-limited progress line with rows/sec and ETA, printed at most once per
+    `interval` seconds (rewritten in place on a terminal).
     """
 
-    # Field type directory - defines structure for all citation fields
-    directory = {
-        'title': {"typeName": "title", "multiple": False, "typeClass": "primitive"},
-        'subtitle': {"typeName": "subtitle", "multiple": False, "typeClass": "primitive"},
-        'alternativeTitle': {"typeName": "alternativeTitle", "multiple": True, "typeClass": "primitive"},
-        'otherId': {"typeName": "otherId", "multiple": True, "typeClass": "compound"},
-        'author': {"typeName": "author", "multiple": True, "typeClass": "compound"},
-        'datasetContact': {"typeName": "datasetContact", "multiple": True, "typeClass": "compound"},
-        'dsDescription': {"typeName": "dsDescription", "multiple": True, "typeClass": "compound"},
-        'subject': {"typeName": "subject", "multiple": True, "typeClass": "controlledVocabulary"},
-        'keyword': {"typeName": "keyword", "multiple": True, "typeClass": "compound"},
-        'topicClassification': {"typeName": "topicClassification", "multiple": True, "typeClass": "compound"},
-        'publication': {"typeName": "publication", "multiple": True, "typeClass": "compound"},
-        'notesText': {"typeName": "notesText", "multiple": False, "typeClass": "primitive"},
-        'language': {"typeName": "language", "multiple": True, "typeClass": "controlledVocabulary"},
-        'producer': {"typeName": "producer", "multiple": True, "typeClass": "compound"},
-        'productionDate': {"typeName": "productionDate", "multiple": False, "typeClass": "primitive"},
-        'productionPlace': {"typeName": "productionPlace", "multiple": True, "typeClass": "primitive"},
-        'contributor': {"typeName": "contributor", "multiple": True, "typeClass": "compound"},
-        'grantNumber': {"typeName": "grantNumber", "multiple": True, "typeClass": "compound"},
-        'distributor': {"typeName": "distributor", "multiple": True, "typeClass": "compound"},
-        'distributionDate': {"typeName": "distributionDate", "multiple": False, "typeClass": "primitive"},
-        'depositor': {"typeName": "depositor", "multiple": False, "typeClass": "primitive"},
-        'dateOfDeposit': {"typeName": "dateOfDeposit", "multiple": False, "typeClass": "primitive"},
-        'timePeriodCovered': {"typeName": "timePeriodCovered", "multiple": True, "typeClass": "compound"},
-        'dateOfCollection': {"typeName": "dateOfCollection", "multiple": True, "typeClass": "compound"},
-        'kindOfData': {"typeName": "kindOfData", "multiple": True, "typeClass": "primitive"},
-        'series': {"typeName": "series", "multiple": True, "typeClass": "compound"},
-        'software': {"typeName": "software", "multiple": True, "typeClass": "compound"},
-        'relatedMaterial': {"typeName": "relatedMaterial", "multiple": True, "typeClass": "primitive"},
-        'relatedDatasets': {"typeName": "relatedDatasets", "multiple": True, "typeClass": "primitive"},
-        'otherReferences': {"typeName": "otherReferences", "multiple": True, "typeClass": "primitive"},
-        'dataSources': {"typeName": "dataSources", "multiple": True, "typeClass": "primitive"},
-        'originOfSources': {"typeName": "originOfSources", "multiple": False, "typeClass": "primitive"},
-        'characteristicOfSources': {"typeName": "characteristicOfSources", "multiple": False, "typeClass": "primitive"},
-        'accessToSources': {"typeName": "accessToSources", "multiple": False, "typeClass": "primitive"}
-    }
+    def __init__(self, total=None, interval=1.0, out=None):
+        self.total = total
+        self.interval = interval
+        self.out = out or sys.stdout
+        self.count = 0
+        self.started = time.perf_counter()
+        self._last = self.started
+        self._inline = hasattr(self.out, 'isatty') and self.out.isatty()
+
+    def update(self, n=1):
+        now = time.perf_counter()
+        if not self.count:
+            # Measure the rate from the first row, not from before the CSV was read
+            self.started = self._last = now
+        self.count += n
+        if now - self._last >= self.interval:
+            self._last = now
+            self._print(now)
+
+    def finish(self):
+        self._print(time.perf_counter())
+        if self._inline:
+            self.out.write('\n')
+        self.out.flush()
+
+    def _print(self, now):
+        elapsed = now - self.started
+        rate = self.count / elapsed if elapsed > 0 else 0.0
+        line = f"  → {self.count:,} rows"
+        if self.total:
+            total = max(self.total, self.count)
+            line += f" / ~{total:,} ({self.count / total:.0%})"
+            if rate and total > self.count:
+                eta = int((total - self.count) / rate)
+                line += f" | {rate:,.0f} rows/s | ETA {eta // 3600}:{eta // 60 % 60:02d}:{eta % 60:02d}"
+            else:
+                line += f" | {rate:,.0f} rows/s"
+        else:
+            line += f" | {rate:,.0f} rows/s"
+        if self._inline:
+            self.out.write('\r' + line.ljust(79))
+        else:
+            self.out.write(line + '\n')
+        self.out.flush()
+
 
-    # Compound field subfield mappings
-    compound_fields = {
-        'otherId': ['otherIdAgency', 'otherIdValue'],
-        'author': ['authorName', 'authorAffiliation', 'authorIdentifierScheme', 'authorIdentifier'],
-        'datasetContact': ['datasetContactName', 'datasetContactAffiliation', 'datasetContactEmail'],
-        'dsDescription': ['dsDescriptionValue', 'dsDescriptionDate'],
-        'keyword': ['keywordValue', 'keywordVocabulary', 'keywordVocabularyURI'],
-        'topicClassification': ['topicClassValue', 'topicClassVocab', 'topicClassVocabURI'],
-        'publication': ['publicationRelationType', 'publicationCitation', 'publicationIDType', 'publicationIDNumber', 'publicationURL'],
-        'producer': ['producerName', 'producerAffiliation', 'producerAbbreviation', 'producerURL', 'producerLogoURL'],
-        'contributor': ['contributorType', 'contributorName'],
-        'grantNumber': ['grantNumberAgency', 'grantNumberValue'],
-        'distributor': ['distributorName', 'distributorAffiliation', 'distributorAbbreviation', 'distributorURL', 'distributorLogoURL'],
-        'timePeriodCovered': ['timePeriodCoveredStart', 'timePeriodCoveredEnd'],
-        'dateOfCollection': ['dateOfCollectionStart', 'dateOfCollectionEnd'],
-        'series': ['seriesName', 'seriesInformation'],
-        'software': ['softwareName', 'softwareVersion']
+def estimate_row_count(csv_file_path):
+    """
+    Rough row count (newlines minus the header) for progress ETAs; None if
+    unknown. Columnar files report their row count; compressed files are not
+    scanned.
+    """
+    try:
+        if columnar_format(csv_file_path):
+            from file_formats import columnar_row_count
+            return columnar_row_count(csv_file_path)
+        if detect_compression(csv_file_path):
+            return None
+        lines = 0
+        with open(csv_file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                lines += block.count(b'\n')
+        return max(lines - 1, 0)
+    except (OSError, TypeError, ValueError):
+        return None
+
+
+def format_date_to_year(date_value, current_year):
+    """Convert any date format to YYYY format"""
+    if is_missing(date_value) or not date_value:
+        return current_year
+
+    date_str = str(date_value).strip()
+
+    # Extract year using regex
+    year_match = re.search(r'\b(19|20)\d{2}\b', date_str)
+    if year_match:
+        return year_match.group(0)
+
+    return current_year
+
+
+def conversion_timestamps():
+    """Return the date/time defaults shared by every row of one conversion run."""
+    now = datetime.now()
+    return {
+        'current_date': now.strftime("%Y-%m-%d"),
+        'current_year': now.strftime("%Y"),
+        'current_datetime': now.strftime("%Y-%m-%dT%H:%M:%SZ")
     }
 
-    # Get current date and time for defaults
-    current_date = datetime.now().strftime("%Y-%m-%d")
-    current_year = datetime.now().strftime("%Y")
-    current_datetime = datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ")
 
-    # Helper function to convert dates to year-only format
-    def format_date_to_year(date_value):
-        """Convert any date format to YYYY format"""
-        if pd.isna(date_value) or not date_value:
-            return current_year
+def _present_value(row, present, col, default=None):
+    """Return the cell for `col` if the column exists and the cell is non-empty, else `default`."""
+    if col in present:
+        value = row[col]
+        if value and not is_missing(value):
+            return value
+    return default
 
-        date_str = str(date_value).strip()
 
-        # Extract year using regex
-        year_match = re.search(r'\b(19|20)\d{2}\b', date_str)
-        if year_match:
-            return year_match.group(0)
+def _text_or(prepared, col, default):
+    """Stripped text of a system column from a prepared row, or `default` when missing or blank."""
+    value = prepared.get(col)
+    return default if value is None else value
+
+
+def _int_or(row, present, col, default):
+    """Integer value of a system column, or `default` when missing or blank."""
+    value = _present_value(row, present, col)
+    if value is None:
+        return default
+    if not isinstance(value, str):
+        return int(value)
+
+    # csv engine cells stay text: accept '2.0', and treat '0' as blank the way
+    # pandas' falsy numeric 0 is
+    try:
+        number = int(value)
+    except ValueError:
+        number = int(float(value))
+    return number if number else default
+
+
+def _build_single(value, current_year):
+    return value
+
+
+def _build_pipe_list(value, current_year):
+    return [v.strip() for v in value.split('|') if v.strip()]
+
+
+def _build_date(value, current_year):
+    return format_date_to_year(value, current_year)
+
+
+def _build_date_list(value, current_year):
+    return _build_pipe_list(format_date_to_year(value, current_year), current_year)
+
+
+def _build_compound(field_name, value, current_year):
+    return _parse_compound(value, field_name, COMPOUND_FIELDS, REGISTRY.type_classes)
 
-        return current_year
 
-    # Read CSV file and process each row
-    df = pd.read_csv(csv_file_path)
-    all_datasets = []
+_VALUE_BUILDERS = {
+    'single': _build_single,
+    'list': _build_pipe_list,
+    'date': _build_date,
+    'date_list': _build_date_list
+}
 
-    for idx, row in df.iterrows():
+
+def _plan_block_fields(block_name, present):
+    """
+    (field_name, FieldType, kind, builder) for each field of a registry block
+    whose column is present. Only citation dates are reduced
+    to a year; dates in other blocks are kept as written.
+    """
+    planned = []
+    for field in REGISTRY.block(block_name)['fields']:
+        field_name = field['name']
+        if field_name not in present:
+            continue
+        type_class = field['typeClass']
+        multiple = field['multiple']
+        if type_class == "primitive":
+            if block_name == 'citation' and field_name in DATE_FIELDS:
+                kind = 'date_list' if multiple else 'date'
+            else:
+                kind = 'list' if multiple else 'single'
+        elif type_class == "controlledVocabulary":
+            kind = 'list' if multiple else 'single'
+        else:
+            kind = 'compound'
+        builder = partial(_build_compound, field_name) if kind == 'compound' else _VALUE_BUILDERS[kind]
+        planned.append((field_name, field_type(field_name, multiple, type_class), kind, builder))
+    return planned
+
+
+@lru_cache(maxsize=32)
+def compile_conversion_plan(columns):
+    """
+    Compile a conversion plan for a CSV header (a tuple of column names).
+
+    The plan lists only the citation fields whose columns are present, each
+    paired with a prebuilt value builder, plus the same for every other
+    registry block that has at least one column, so per-row work is limited
+    to the columns the CSV actually has.
+    """
+    present = frozenset(columns)
+    blocks = []
+    for block_name, block in REGISTRY.blocks.items():
+        if block_name == 'citation':
+            continue
+        block_fields = _plan_block_fields(block_name, present)
+        if block_fields:
+            blocks.append((block_name, block['displayName'], block_fields))
+
+    return {
+        'columns': present,
+        'system_text': tuple(col for col in SYSTEM_TEXT_COLUMNS if col in present),
+        'citation': _plan_block_fields('citation', present),
+        'blocks': blocks,
+        'files': 'files' in present,
+        'citation_text': 'citation' in present
+    }
+
+
+def prepare_row(row, plan, current_year):
+    """
+    Clean one row's cells the same way normalize_chunk() does for a whole chunk.
+    Returns {column: value} with stripped system texts and built citation values;
+    blank cells are left out.
+    """
+    prepared = {}
+    for col in plan['system_text']:
+        value = row[col]
+        if value and not is_missing(value):
+            prepared[col] = str(value).strip()
+
+    for field_name, _, _, builder in plan['citation']:
+        raw = row[field_name]
+        if is_missing(raw) or raw == "":
+            continue
+        value = str(raw).strip()
+        if value:
+            prepared[field_name] = builder(value, current_year)
+    return prepared
+
+
+def normalize_chunk(values, columns, plan, current_year, profiler=NO_PROFILER):
+    """
+    Vectorized pre-normalization of a chunk (`values` is `DataFrame.values`).
+
+    Null masking, trimming, pipe splitting and year extraction run over whole
+    columns with pandas string ops; returns one prepared dict per row, equal to
+    what prepare_row() gives for that row.
+    """
+    import pandas as pd
+
+    position = {col: i for i, col in enumerate(columns)}
+    prepared_rows = [{} for _ in range(len(values))]
+
+    def column(col):
+        # Build from the row array so cells keep exactly the values rows see
+        return pd.Series(values[:, position[col]], dtype=object)
+
+    def scatter(col, series):
+        for i, value in zip(series.index, series.tolist()):
+            prepared_rows[i][col] = value
+
+    with profiler.stage('normalize'):
+        for col in plan['system_text']:
+            series = column(col)
+            series = series[series.notna() & (series != "") & (series != 0)]
+            scatter(col, series.astype(str).str.strip())
+
+    for field_name, _, kind, builder in plan['citation']:
+        with profiler.stage('parse_compound' if kind == 'compound' else 'normalize'):
+            series = column(field_name)
+            series = series[series.notna() & (series != "")].astype(str).str.strip()
+            series = series[series != ""]
+            if kind in ('date', 'date_list'):
+                series = series.str.extract(YEAR_PATTERN, expand=False).fillna(current_year)
+            if kind in ('list', 'date_list'):
+                series = series.str.split('|').map(lambda parts: [v.strip() for v in parts if v.strip()])
+            elif kind == 'compound':
+                series = series.map(partial(builder, current_year=current_year))
+            scatter(field_name, series)
+
+    return prepared_rows
+
+
+def build_dataset_json(row, idx, defaults=None, timestamps=None, plan=None, prepared=None, profiler=NO_PROFILER):
+    """
+    Build the complete Dataverse JSON structure for a single CSV row.
+    `idx` is the zero-based row position used for fallback IDs; `row` may be a
+    pandas Series or a plain dict keyed by column name. `prepared` holds the
+    row's pre-normalized values (see normalize_chunk); it is computed here when
+    not given.
+    """
+    return to_plain(_build_dataset(row, idx, defaults, timestamps, plan, prepared, profiler))
+
+
+def _build_dataset(row, idx, defaults=None, timestamps=None, plan=None, prepared=None, profiler=NO_PROFILER):
+    """build_dataset_json() with the metadata fields kept as Field objects."""
+    timestamps = timestamps or conversion_timestamps()
+    current_date = timestamps['current_date']
+    current_year = timestamps['current_year']
+    current_datetime = timestamps['current_datetime']
+    plan = plan or compile_conversion_plan(tuple(row.keys()))
+    present = plan['columns']
+    if prepared is None:
+        with profiler.stage('normalize'):
+            prepared = prepare_row(row, plan, current_year)
+
+    with profiler.stage('dataset_literal'):
         # Generate unique IDs if not provided
-        dataset_id = int(row.get('id', 0)) if row.get('id') and not pd.isna(row.get('id')) else 1000 + idx
-        version_id = int(row.get('versionId', 0)) if row.get('versionId') and not pd.isna(row.get('versionId')) else 2000 + idx
-        
+        dataset_id = _int_or(row, present, 'id', 1000 + idx)
+        version_id = _int_or(row, present, 'versionId', 2000 + idx)
+
         # Generate identifier/DOI if not provided
-        if row.get('identifier') and not pd.isna(row.get('identifier')):
-            identifier = str(row.get('identifier'))
+        identifier = _present_value(row, present, 'identifier')
+        if identifier is not None:
+            identifier = str(identifier)
         else:
             identifier = f"FK2/{uuid.uuid4().hex[:8].upper()}"
 
         # Get protocol and authority
-        protocol = str(row.get('protocol', 'doi')).strip() if row.get('protocol') and not pd.isna(row.get('protocol')) else 'doi'
-        authority = str(row.get('authority', '10.70122')).strip() if row.get('authority') and not pd.isna(row.get('authority')) else '10.70122'
-        
+        protocol = _text_or(prepared, 'protocol', 'doi')
+        authority = _text_or(prepared, 'authority', '10.70122')
+
+        # Blank cells still count as a storage identifier; only missing/NaN gets a default
+        storage_identifier = None
+        if 'storageIdentifier' in present and not is_missing(row['storageIdentifier']):
+            storage_identifier = str(row['storageIdentifier'])
+
         # Build complete JSON structure with all top-level fields
         dataset_json = {
             "id": dataset_id,
@@ -239,41 +616,41 @@ def csv_to_dataverse_json(csv_file_path, output_json_path, defaults=None):
             "protocol": protocol,
             "authority": authority,
             "separator": "/",
-            "publisher": str(row.get('publisher', 'Dataverse')).strip() if row.get('publisher') and not pd.isna(row.get('publisher')) else 'Dataverse',
-            "publicationDate": str(row.get('publicationDate', current_date)).strip() if row.get('publicationDate') and not pd.isna(row.get('publicationDate')) else current_date,
-            "storageIdentifier": f"s3://{authority}/{identifier}" if row.get('storageIdentifier') is None or pd.isna(row.get('storageIdentifier')) else str(row.get('storageIdentifier')),
-            "datasetType": str(row.get('datasetType', 'dataset')).strip() if row.get('datasetType') and not pd.isna(row.get('datasetType')) else 'dataset',
+            "publisher": _text_or(prepared, 'publisher', 'Dataverse'),
+            "publicationDate": _text_or(prepared, 'publicationDate', current_date),
+            "storageIdentifier": f"s3://{authority}/{identifier}" if storage_identifier is None else storage_identifier,
+            "datasetType": _text_or(prepared, 'datasetType', 'dataset'),
             "datasetVersion": {
                 "id": version_id,
                 "datasetId": dataset_id,
                 "datasetPersistentId": f"{protocol}:{authority}/{identifier}",
-                "datasetType": str(row.get('datasetType', 'dataset')).strip() if row.get('datasetType') and not pd.isna(row.get('datasetType')) else 'dataset',
-                "storageIdentifier": f"s3://{authority}:{uuid.uuid4().hex[:12]}-{uuid.uuid4().hex[:12]}" if row.get('storageIdentifier') is None or pd.isna(row.get('storageIdentifier')) else str(row.get('storageIdentifier')),
-                "versionNumber": int(row.get('versionNumber', 1)) if row.get('versionNumber') and not pd.isna(row.get('versionNumber')) else 1,
-                "internalVersionNumber": int(row.get('internalVersionNumber', 1)) if row.get('internalVersionNumber') and not pd.isna(row.get('internalVersionNumber')) else 1,
-                "versionMinorNumber": int(row.get('versionMinorNumber', 0)) if row.get('versionMinorNumber') and not pd.isna(row.get('versionMinorNumber')) else 0,
-                "versionState": str(row.get('versionState', 'DRAFT')).strip() if row.get('versionState') and not pd.isna(row.get('versionState')) else 'DRAFT',
-                "latestVersionPublishingState": str(row.get('latestVersionPublishingState', 'DRAFT')).strip() if row.get('latestVersionPublishingState') and not pd.isna(row.get('latestVersionPublishingState')) else 'DRAFT',
-                "UNF": str(row.get('UNF', '')).strip() if row.get('UNF') and not pd.isna(row.get('UNF')) else '',
-                "lastUpdateTime": str(row.get('lastUpdateTime', current_datetime)).strip() if row.get('lastUpdateTime') and not pd.isna(row.get('lastUpdateTime')) else current_datetime,
-                "releaseTime": str(row.get('releaseTime', '')).strip() if row.get('releaseTime') and not pd.isna(row.get('releaseTime')) else '',
-                "createTime": str(row.get('createTime', current_datetime)).strip() if row.get('createTime') and not pd.isna(row.get('createTime')) else current_datetime,
-                "publicationDate": str(row.get('publicationDate', current_date)).strip() if row.get('publicationDate') and not pd.isna(row.get('publicationDate')) else current_date,
-                "citationDate": str(row.get('citationDate', current_date)).strip() if row.get('citationDate') and not pd.isna(row.get('citationDate')) else current_date,
-                "termsOfUse": str(row.get('termsOfUse', '')).strip() if row.get('termsOfUse') and not pd.isna(row.get('termsOfUse')) else '',
-                "citationRequirements": str(row.get('citationRequirements', '')).strip() if row.get('citationRequirements') and not pd.isna(row.get('citationRequirements')) else '',
-                "conditions": str(row.get('conditions', '')).strip() if row.get('conditions') and not pd.isna(row.get('conditions')) else '',
-                "termsOfAccess": str(row.get('termsOfAccess', '')).strip() if row.get('termsOfAccess') and not pd.isna(row.get('termsOfAccess')) else '',
+                "datasetType": _text_or(prepared, 'datasetType', 'dataset'),
+                "storageIdentifier": f"s3://{authority}:{uuid.uuid4().hex[:12]}-{uuid.uuid4().hex[:12]}" if storage_identifier is None else storage_identifier,
+                "versionNumber": _int_or(row, present, 'versionNumber', 1),
+                "internalVersionNumber": _int_or(row, present, 'internalVersionNumber', 1),
+                "versionMinorNumber": _int_or(row, present, 'versionMinorNumber', 0),
+                "versionState": _text_or(prepared, 'versionState', 'DRAFT'),
+                "latestVersionPublishingState": _text_or(prepared, 'latestVersionPublishingState', 'DRAFT'),
+                "UNF": _text_or(prepared, 'UNF', ''),
+                "lastUpdateTime": _text_or(prepared, 'lastUpdateTime', current_datetime),
+                "releaseTime": _text_or(prepared, 'releaseTime', ''),
+                "createTime": _text_or(prepared, 'createTime', current_datetime),
+                "publicationDate": _text_or(prepared, 'publicationDate', current_date),
+                "citationDate": _text_or(prepared, 'citationDate', current_date),
+                "termsOfUse": _text_or(prepared, 'termsOfUse', ''),
+                "citationRequirements": _text_or(prepared, 'citationRequirements', ''),
+                "conditions": _text_or(prepared, 'conditions', ''),
+                "termsOfAccess": _text_or(prepared, 'termsOfAccess', ''),
                 "license": {
-                    "name": str(row.get('licenseName', 'CC0 1.0')).strip() if row.get('licenseName') and not pd.isna(row.get('licenseName')) else 'CC0 1.0',
-                    "uri": str(row.get('licenseUri', 'http://creativecommons.org/publicdomain/zero/1.0')).strip() if row.get('licenseUri') and not pd.isna(row.get('licenseUri')) else 'http://creativecommons.org/publicdomain/zero/1.0',
-                    "iconUri": str(row.get('licenseIconUri', 'https://licensebuttons.net/p/zero/1.0/88x31.png')).strip() if row.get('licenseIconUri') and not pd.isna(row.get('licenseIconUri')) else 'https://licensebuttons.net/p/zero/1.0/88x31.png',
-                    "rightsIdentifier": str(row.get('rightsIdentifier', 'CC0-1.0')).strip() if row.get('rightsIdentifier') and not pd.isna(row.get('rightsIdentifier')) else 'CC0-1.0',
-                    "rightsIdentifierScheme": str(row.get('rightsIdentifierScheme', 'SPDX')).strip() if row.get('rightsIdentifierScheme') and not pd.isna(row.get('rightsIdentifierScheme')) else 'SPDX',
-                    "schemeUri": str(row.get('schemeUri', 'https://spdx.org/licenses/')).strip() if row.get('schemeUri') and not pd.isna(row.get('schemeUri')) else 'https://spdx.org/licenses/',
-                    "languageCode": str(row.get('languageCode', 'en')).strip() if row.get('languageCode') and not pd.isna(row.get('languageCode')) else 'en'
+                    "name": _text_or(prepared, 'licenseName', 'CC0 1.0'),
+                    "uri": _text_or(prepared, 'licenseUri', 'http://creativecommons.org/publicdomain/zero/1.0'),
+                    "iconUri": _text_or(prepared, 'licenseIconUri', 'https://licensebuttons.net/p/zero/1.0/88x31.png'),
+                    "rightsIdentifier": _text_or(prepared, 'rightsIdentifier', 'CC0-1.0'),
+                    "rightsIdentifierScheme": _text_or(prepared, 'rightsIdentifierScheme', 'SPDX'),
+                    "schemeUri": _text_or(prepared, 'schemeUri', 'https://spdx.org/licenses/'),
+                    "languageCode": _text_or(prepared, 'languageCode', 'en')
                 },
-                "fileAccessRequest": bool(row.get('fileAccessRequest', True)) if row.get('fileAccessRequest') and not pd.isna(row.get('fileAccessRequest')) else True,
+                "fileAccessRequest": bool(_present_value(row, present, 'fileAccessRequest', True)),
                 "metadataBlocks": {
                     "citation": {
                         "displayName": "Citation Metadata",
@@ -284,95 +661,715 @@ def csv_to_dataverse_json(csv_file_path, output_json_path, defaults=None):
             }
         }
 
-        fields = dataset_json["datasetVersion"]["metadataBlocks"]["citation"]["fields"]
+        fields = FieldStore()
+
+        # Process only the metadata fields whose columns exist in this CSV
+        for field_name, ftype, _, _ in plan['citation']:
+            field_value = prepared.get(field_name)
+            if field_value:
+                fields.add(Field(ftype, field_value))
+
+    with profiler.stage('blocks'):
+        # Add the other metadata blocks (geospatial, socialscience, ...) that have values
+        for block_plan in plan['blocks']:
+            block = _build_metadata_block(block_plan, row, current_year)
+            if block:
+                dataset_json["datasetVersion"]["metadataBlocks"][block_plan[0]] = block
+
+    # Add files array if present
+    if plan['files'] and row['files'] and not is_missing(row['files']):
+        try:
+            files_data = json.loads(row['files']) if isinstance(row['files'], str) else row['files']
+            dataset_json["datasetVersion"]["files"] = files_data if isinstance(files_data, list) else [files_data]
+        except json.JSONDecodeError:
+            profiler.count('files_json_failures')
+            print(f"  ⚠ Warning: Could not parse files JSON in row {idx + 1}")
+
+    # Add citation field if present
+    if plan['citation_text'] and row['citation'] and not is_missing(row['citation']):
+        dataset_json["citation"] = str(row['citation']).strip()
+
+    # Ensure required fields exist (author, datasetContact email, description)
+    with profiler.stage('required_fields'):
+        filled = fill_required_fields(fields, row, defaults)
+    dataset_json["datasetVersion"]["metadataBlocks"]["citation"]["fields"] = fields.to_list()
+
+    if profiler.enabled:
+        profiler.count('placeholder_fills', filled)
+        for block in dataset_json["datasetVersion"]["metadataBlocks"].values():
+            profiler.count('fields_emitted', len(block["fields"]))
+            profiler.count('compound_entries', sum(len(f["value"]) for f in block["fields"] if f["typeClass"] == "compound"))
+
+    return dataset_json
+
+
+class RecordChunk:
+    """
+    Rows read by the csv engine, exposing the parts of the DataFrame chunk
+    interface the converter uses (`columns`, `index`, `values`, `take`).
+    """
+
+    __slots__ = ('columns', 'index', 'values')
 
-        # Process each metadata field
-        for field_name, field_config in directory.items():
-            if field_name not in row or pd.isna(row[field_name]) or row[field_name] == "":
-                continue
+    def __init__(self, columns, index, values):
+        self.columns = columns
+        self.index = index
+        self.values = values
 
-            value = str(row[field_name]).strip()
-            if not value:
-                continue
+    def __len__(self):
+        return len(self.values)
 
-            # Build field structure
-            field_entry = {
-                "typeName": field_config["typeName"],
-                "multiple": field_config["multiple"],
-                "typeClass": field_config["typeClass"]
-            }
+    def take(self, positions):
+        return RecordChunk(self.columns, [self.index[i] for i in positions], [self.values[i] for i in positions])
 
-            # Process based on type
-            if field_config["typeClass"] == "primitive":
-                # Convert date fields to year-only format
-                if field_name in ['productionDate', 'distributionDate', 'dateOfDeposit']:
-                    value = format_date_to_year(value)
-                if field_config["multiple"]:
-                    # Multiple primitive: split by pipe
-                    field_entry["value"] = [v.strip() for v in value.split('|') if v.strip()]
+
+def _is_csv_path(csv_source):
+    return isinstance(csv_source, (str, bytes, os.PathLike))
+
+
+def _iter_record_chunks(csv_source, chunksize, profiler=NO_PROFILER):
+    """
+    Read the CSV with csv.DictReader in chunks of `chunksize` rows.
+    Cells pandas would read as NaN become None; everything else stays text.
+    `csv_source` is a path (possibly compressed), a text file object or any
+    iterable of lines.
+    """
+    with open_text(csv_source) if _is_csv_path(csv_source) else nullcontext(csv_source) as f:
+        reader = csv.DictReader(f)
+        columns = list(reader.fieldnames or [])
+        idx = 0
+        while True:
+            with profiler.stage('csv_read'):
+                index, values = [], []
+                for record in reader:
+                    values.append([None if (cell := record.get(col)) is None or cell in CSV_NA_VALUES else cell
+                                   for col in columns])
+                    index.append(idx)
+                    idx += 1
+                    if len(values) >= chunksize:
+                        break
+            if not values:
+                return
+            yield RecordChunk(columns, index, values)
+
+
+def _iter_columnar_chunks(path, chunksize, profiler=NO_PROFILER, engine='pandas'):
+    """
+    Read a Parquet or Arrow IPC file one record batch at a time, loading only
+    the columns in INPUT_COLUMNS. Blank strings become nulls, as blank CSV
+    cells do; batches then become DataFrames for the pandas engine and
+    RecordChunks for the csv engine.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    from file_formats import columnar_schema_names, iter_columnar_batches
+
+    def blank_to_null(column):
+        if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+            return pc.if_else(pc.equal(column, ''), None, column)
+        return column
+
+    columns = [col for col in columnar_schema_names(path) if col in INPUT_COLUMNS]
+    batches = iter_columnar_batches(path, columns, chunksize)
+    idx = 0
+    while True:
+        with profiler.stage('csv_read'):
+            batch = next(batches, None)
+            if batch is None:
+                return
+            batch = pa.RecordBatch.from_arrays([blank_to_null(column) for column in batch.columns], names=columns)
+            index = range(idx, idx + batch.num_rows)
+            if engine == 'csv':
+                chunk = RecordChunk(columns, list(index),
+                                    [list(row) for row in zip(*(column.to_pylist() for column in batch.columns))])
+            else:
+                chunk = batch.to_pandas()
+                chunk.index = index
+        idx += batch.num_rows
+        yield chunk
+
+
+def _iter_indexed_chunks(csv_file_path, rows, chunksize, profiler=NO_PROFILER, engine='pandas'):
+    """
+    Read only `rows` (0-based data rows) of a CSV, sliced out of the
+    memory-mapped file through its row index (row_index.RowIndex). Chunks keep
+    the rows' positions in the whole file as their index.
+    """
+    from row_index import RowIndex
+
+    with RowIndex.open(csv_file_path) as index:
+        header = index.header_text()
+        blocks = index.iter_blocks(rows, chunksize)
+        while True:
+            with profiler.stage('csv_read'):
+                block = next(blocks, None)
+                if block is None:
+                    return
+                block_rows, text = block
+                if engine == 'csv':
+                    parsed = next(_iter_record_chunks(io.StringIO(header + text), float('inf')))
+                    chunk = RecordChunk(parsed.columns, block_rows, parsed.values)
                 else:
-                    # Single primitive
-                    field_entry["value"] = value
-
-            elif field_config["typeClass"] == "controlledVocabulary":
-                # Controlled vocabulary: split by pipe
-                field_entry["value"] = [v.strip() for v in value.split('|') if v.strip()]
-
-            elif field_config["typeClass"] == "compound":
-                # Compound: parse with subfields
-                field_entry["value"] = parse_compound(value, field_name, compound_fields)
-
-            # Add to fields list
-            if field_entry.get("value"):
-                fields.append(field_entry)
-
-        # Add geospatial metadata block if present
-        if any(col in row for col in ['geographicCoverage', 'geographicUnit', 'geographicBoundingBox']):
-            geo_block = create_geospatial_block(row)
-            if geo_block:
-                dataset_json["datasetVersion"]["metadataBlocks"]["geospatial"] = geo_block
-
-        # Add social science metadata block if present
-        if any(col in row for col in ['unitOfAnalysis', 'universe', 'timeMethod', 'samplingProcedure']):
-            social_block = create_socialscience_block(row)
-            if social_block:
-                dataset_json["datasetVersion"]["metadataBlocks"]["socialscience"] = social_block
-
-        # Add files array if present
-        if 'files' in row and row['files'] and not pd.isna(row['files']):
+                    import pandas as pd
+                    chunk = pd.read_csv(io.StringIO(header + text))
+                    chunk.index = block_rows
+            if len(chunk) != len(block_rows):
+                raise ValueError(f"Row index of {csv_file_path} does not match the file; delete it to rebuild")
+            yield chunk
+
+
+def iter_csv_chunks(csv_file_path, chunksize=None, stream=False, profiler=NO_PROFILER, engine='pandas', rows=None):
+    """
+    Yield the CSV as chunks of rows: DataFrames for the pandas engine,
+    RecordChunks for the csv engine. `csv_file_path` may also be an open text
+    file or an in-memory iterable of lines (e.g. `io.StringIO` or a list).
+    Compressed files (.gz, .bz2, .xz, .zst) are decompressed while reading;
+    Parquet and Arrow files are read batch by batch with only the columns the
+    converter uses.
+
+    With `stream=True` the file is read `chunksize` rows at a time so only one
+    chunk is held in memory; pandas then infers column types per chunk.
+    Otherwise the whole file is read once and, if `chunksize` is given, sliced.
+    Columnar files are always read in batches of `chunksize` rows.
+    With `rows` (0-based data rows), only those rows are read, using the
+    CSV's byte-offset row index.
+    """
+    if rows is not None:
+        yield from _iter_indexed_chunks(csv_file_path, rows, chunksize or 1000, profiler, engine)
+        return
+
+    if _is_csv_path(csv_file_path) and columnar_format(csv_file_path):
+        yield from _iter_columnar_chunks(csv_file_path, chunksize or 1000, profiler, engine)
+        return
+
+    if engine == 'csv':
+        if stream:
+            yield from _iter_record_chunks(csv_file_path, chunksize or 1000, profiler)
+        else:
+            whole = list(_iter_record_chunks(csv_file_path, float('inf'), profiler))
+            if whole:
+                chunk = whole[0]
+                step = chunksize or len(chunk) or 1
+                for start in range(0, len(chunk), step):
+                    yield chunk.take(range(start, min(start + step, len(chunk))))
+        return
+
+    import pandas as pd
+
+    if not _is_csv_path(csv_file_path) and not hasattr(csv_file_path, 'read'):
+        csv_file_path = io.StringIO(''.join(csv_file_path))
+    # Compressed files go through the same streaming decompressors as the csv engine
+    compressed = _is_csv_path(csv_file_path) and detect_compression(csv_file_path)
+
+    if stream:
+        with open_text(csv_file_path) if compressed else nullcontext(csv_file_path) as source, \
+                pd.read_csv(source, chunksize=chunksize or 1000) as reader:
+            while True:
+                with profiler.stage('csv_read'):
+                    chunk = next(reader, None)
+                if chunk is None:
+                    return
+                yield chunk
+
+    with profiler.stage('csv_read'), open_text(csv_file_path) if compressed else nullcontext(csv_file_path) as source:
+        df = pd.read_csv(source)
+    if not chunksize:
+        yield df
+        return
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start:start + chunksize]
+
+
+def convert_chunk(chunk, defaults=None, timestamps=None, profiler=NO_PROFILER):
+    """
+    Convert every row of a chunk; returns a list of (idx, dataset_json).
+    Rows are plain dicts; for DataFrames they are taken from the same array
+    `DataFrame.iterrows` uses and pre-normalized column-wise.
+    """
+    return [(idx, to_plain(dataset_json)) for idx, dataset_json in _convert_chunk(chunk, defaults, timestamps, profiler)]
+
+
+def _convert_chunk(chunk, defaults=None, timestamps=None, profiler=NO_PROFILER):
+    """convert_chunk() with the metadata fields kept as Field objects, which also pickle compactly."""
+    timestamps = timestamps or conversion_timestamps()
+    columns = list(chunk.columns)
+    plan = compile_conversion_plan(tuple(columns))
+    values = chunk.values
+    if isinstance(chunk, RecordChunk):
+        prepared_rows = [None] * len(values)
+    else:
+        prepared_rows = normalize_chunk(values, columns, plan, timestamps['current_year'], profiler)
+    return [(idx, _build_dataset(dict(zip(columns, row_values)), idx, defaults, timestamps, plan, prepared, profiler))
+            for idx, row_values, prepared in zip(chunk.index, values, prepared_rows)]
+
+
+def _convert_chunk_profiled(chunk, defaults, timestamps):
+    """Worker entry point: convert a chunk and return its results with a profiler snapshot."""
+    profiler = ConversionProfiler()
+    results = _convert_chunk(chunk, defaults, timestamps, profiler)
+    return results, profiler.snapshot()
+
+
+def _map_chunks(jobs, defaults, timestamps, workers=None, profiler=NO_PROFILER):
+    """
+    Convert the chunk of each (context, chunk) job and yield (context, results)
+    in job order. With `workers` > 1 chunks run on a process pool, with at most
+    two chunks per worker in flight so streaming input stays bounded; worker
+    stage timings are then summed across processes.
+    """
+    if not workers or workers <= 1:
+        for context, chunk in jobs:
+            yield context, _convert_chunk(chunk, defaults, timestamps, profiler)
+        return
+
+    def collect(future):
+        if not profiler.enabled:
+            return future.result()
+        results, snapshot = future.result()
+        profiler.merge(snapshot)
+        return results
+
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for context, chunk in jobs:
+            if profiler.enabled:
+                future = executor.submit(_convert_chunk_profiled, chunk, defaults, timestamps)
+            else:
+                future = executor.submit(_convert_chunk, chunk, defaults, timestamps)
+            pending.append((context, future))
+            if len(pending) >= workers * 2:
+                context, future = pending.popleft()
+                yield context, collect(future)
+        while pending:
+            context, future = pending.popleft()
+            yield context, collect(future)
+
+
+def _iter_converted_cached(chunks, defaults, timestamps, workers, cache, profiler=NO_PROFILER):
+    """Reuse cached datasets for unchanged rows and convert only the rest."""
+    def jobs():
+        for chunk in chunks:
+            with profiler.stage('cache_lookup'):
+                columns = list(chunk.columns)
+                keys = cache.row_keys(columns, chunk.values, chunk.index, defaults)
+                hits = cache.get_many(keys)
+                misses = [pos for pos, key in enumerate(keys) if key not in hits]
+            profiler.count('cache_hits', len(keys) - len(misses))
+            yield (chunk.index, keys, hits), chunk.take(misses)
+
+    for (index, keys, hits), converted in _map_chunks(jobs(), defaults, timestamps, workers, profiler):
+        converted = iter(converted)
+        for idx, key in zip(index, keys):
+            if key in hits:
+                yield idx, hits[key]
+            else:
+                item = next(converted)
+                cache.put(key, item[1])
+                yield item
+
+
+def iter_dataverse_datasets(csv_file_path, defaults=None, chunksize=None, stream=False, workers=None, cache=None,
+                            profiler=NO_PROFILER, progress=None, engine='pandas', validator=None, rows=None,
+                            with_rows=False):
+    """
+    Yield one converted Dataverse dataset dict per CSV row, in row order;
+    with `with_rows`, yield (0-based row, dataset) pairs instead.
+    With `workers` > 1 rows are converted in chunks on a process pool.
+    With a `cache` (row_cache.RowCache), unchanged rows are taken from the cache.
+    `progress` (a ProgressReporter) is updated once per row.
+    `engine` is 'pandas' (pandas.read_csv) or 'csv' (csv.DictReader, no pandas import).
+    A `validator` (vocabulary.VocabularyValidator) checks each chunk's
+    controlled-vocabulary columns before it is converted.
+    `rows` limits the conversion to those 0-based data rows (see iter_csv_chunks).
+    """
+    datasets = _iter_datasets(csv_file_path, defaults, chunksize, stream, workers, cache, profiler, progress,
+                              engine, validator, rows, with_rows)
+    if with_rows:
+        return ((row, to_plain(dataset_json)) for row, dataset_json in datasets)
+    return (to_plain(dataset_json) for dataset_json in datasets)
+
+
+def _iter_datasets(csv_file_path, defaults=None, chunksize=None, stream=False, workers=None, cache=None,
+                   profiler=NO_PROFILER, progress=None, engine='pandas', validator=None, rows=None,
+                   with_rows=False):
+    """
+    iter_dataverse_datasets() with the metadata fields kept as compact
+    metadata_fields.Field objects, as the converter passes them to the
+    writers; JsonSerializer encodes them as the usual field dicts.
+    """
+    timestamps = conversion_timestamps()
+    if workers and workers > 1:
+        chunksize = chunksize or 500
+    # Convert in slices so results (and progress) flow before the whole file is done
+    chunksize = chunksize or 1000
+    chunks = iter_csv_chunks(csv_file_path, chunksize=chunksize, stream=stream, profiler=profiler, engine=engine,
+                             rows=rows)
+    if validator is not None:
+        chunks = validator.filter_chunks(chunks, profiler)
+    if cache is not None:
+        converted = _iter_converted_cached(chunks, defaults, timestamps, workers, cache, profiler)
+    else:
+        jobs = ((None, chunk) for chunk in chunks)
+        converted = (item for _, results in _map_chunks(jobs, defaults, timestamps, workers, profiler)
+                     for item in results)
+
+    for row, dataset_json in converted:
+        profiler.count('rows')
+        if progress is not None:
+            progress.update()
+        yield (row, dataset_json) if with_rows else dataset_json
+
+
+class JsonSerializer:
+    """
+    JSON encoder writing UTF-8 bytes. `backend` is 'stdlib', 'orjson' or
+    'auto' (orjson when installed and the indent allows it, else stdlib).
+    `indent=None` gives compact output without whitespace. Datasets may hold
+    metadata_fields.Field objects; both backends encode them straight from
+    that form, as the usual field dicts, through metadata_fields.encode_field.
+    """
+
+    __slots__ = ('backend', 'indent', '_dumps')
+
+    def __init__(self, backend='stdlib', indent=2):
+        if backend == 'auto':
+            backend = 'orjson' if indent in (None, 2) and _orjson_available() else 'stdlib'
+        self.backend = backend
+        self.indent = indent
+
+        if backend == 'stdlib':
+            # Datasets are trees, so the per-container cycle check is skipped
+            if indent is None:
+                encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=encode_field,
+                                           check_circular=False)
+            else:
+                encoder = json.JSONEncoder(ensure_ascii=False, indent=indent, default=encode_field,
+                                           check_circular=False)
+            self._dumps = lambda obj: encoder.encode(obj).encode('utf-8')
+        elif backend == 'orjson':
             try:
-                files_data = json.loads(row['files']) if isinstance(row['files'], str) else row['files']
-                dataset_json["datasetVersion"]["files"] = files_data if isinstance(files_data, list) else [files_data]
-            except json.JSONDecodeError:
-                print(f"  ⚠ Warning: Could not parse files JSON in row {idx + 1}")
+                import orjson
+            except ImportError:
+                raise ValueError("JSON backend 'orjson' requires the orjson package (pip install orjson)")
+            if indent not in (None, 2):
+                raise ValueError("JSON backend 'orjson' only supports --indent 2 or --compact")
+            option = orjson.OPT_INDENT_2 if indent == 2 else 0
+            self._dumps = lambda obj: orjson.dumps(obj, default=encode_field, option=option)
+        else:
+            raise ValueError(f"Unknown JSON backend: {backend}")
+
+    def dumps(self, obj):
+        return self._dumps(obj)
+
+    def dump(self, obj, f):
+        """Write `obj` to a binary file."""
+        f.write(self._dumps(obj))
+
+    def array_item(self, obj):
+        """Encode `obj` as an element of a top-level array, nested as a whole-array dump would."""
+        data = self._dumps(obj)
+        if self.indent is None:
+            return data
+        pad = b' ' * self.indent
+        return pad + data.replace(b'\n', b'\n' + pad)
+
+
+def _orjson_available():
+    try:
+        import orjson  # noqa: F401
+    except ImportError:
+        return False
+    return True
 
-        # Add citation field if present
-        if 'citation' in row and row['citation'] and not pd.isna(row['citation']):
-            dataset_json["citation"] = str(row['citation']).strip()
 
-        # Ensure required fields exist (author, datasetContact email, description)
-        ensure_required_fields(dataset_json, row, defaults)
+def available_json_backends():
+    return ['stdlib', 'orjson'] if _orjson_available() else ['stdlib']
 
-        all_datasets.append(dataset_json)
-        print(f"✓ Row {idx + 1}: Dataset ID={dataset_id}, Processed {len(fields)} citation fields")
 
-    # Write output JSON file
-    # If single row, write as single object; if multiple rows, write as array
-    output_data = all_datasets[0] if len(all_datasets) == 1 else all_datasets
+def check_serializers(obj, indent=2):
+    """
+    Encode `obj` with every installed backend and verify they decode to the
+    same data as json.dumps gives. Raises ValueError naming the first backend
+    that differs.
+    """
+    reference = json.loads(json.dumps(to_plain(obj), ensure_ascii=False))
+    for backend in available_json_backends():
+        if json.loads(JsonSerializer(backend, indent).dumps(obj)) != reference:
+            raise ValueError(f"JSON backend '{backend}' output differs from json.dumps")
+    return True
 
-    with open(output_json_path, 'w', encoding='utf-8') as f:
-        json.dump(output_data, f, indent=2, ensure_ascii=False)
+
+@contextmanager
+def _replace_on_success(path, compression):
+    """
+    Open `path` for binary writing. A regular file (or a new one) is written
+    under a temporary name next to the file a symlink points to and renamed
+    onto it once the block finishes, keeping an existing file's permissions;
+    on error it is removed, so a failed run leaves any earlier output as it
+    was and never a partial file. Anything else (a FIFO, a device, a path
+    under /dev such as /dev/stdout) is written directly.
+    """
+    if compression == 'infer':
+        compression = compression_for_path(path)
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        mode = None
+    # /dev/stdout and /dev/fd/N may lead to a regular file another process holds open
+    if mode is not None and (not stat.S_ISREG(mode) or os.path.abspath(path).startswith('/dev/')):
+        with open_binary(path, 'wb', compression) as f:
+            yield f
+        return
+
+    target = os.path.realpath(path)
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    try:
+        with open_binary(tmp_path, 'wb', compression) as f:
+            yield f
+        if mode is not None:
+            os.chmod(tmp_path, stat.S_IMODE(mode))
+        os.replace(tmp_path, target)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_datasets_stream(datasets, output_json_path, output_format='json', serializer=None, check=False,
+                          profiler=NO_PROFILER, compression='infer'):
+    """
+    Write datasets to disk (or to a binary file object) one at a time as they are produced.
+    Paths ending in .gz, .bz2, .xz or .zst are compressed as they are written;
+    `compression` overrides the suffix (None for plain output).
+
+    'json' gives the same layout as the in-memory path (a single object for one
+    dataset, otherwise an array); 'jsonl' writes one compact dataset per line.
+    With `check`, every dataset is also verified with check_serializers().
+    A path is written under a temporary name and only replaces the target once
+    every dataset is written, so an error leaves no partial output.
+    Returns the number of datasets written.
+    """
+    serializer = serializer or JsonSerializer()
+    count = 0
+    with nullcontext(output_json_path) if hasattr(output_json_path, 'write') else \
+            _replace_on_success(output_json_path, compression) as f:
+        if output_format == 'jsonl':
+            line_serializer = JsonSerializer(serializer.backend, indent=None)
+            for dataset_json in datasets:
+                if check:
+                    check_serializers(dataset_json, indent=None)
+                with profiler.stage('serialization'):
+                    f.write(line_serializer.dumps(dataset_json))
+                    f.write(b'\n')
+                count += 1
+            return count
+
+        open_array, separator, close_array = (b'[', b',', b']') if serializer.indent is None else (b'[\n', b',\n', b'\n]')
+        # Hold back the first dataset until we know whether an array is needed
+        pending = None
+        for dataset_json in datasets:
+            if check:
+                check_serializers(dataset_json, serializer.indent)
+            if count == 0:
+                pending = dataset_json
+            else:
+                with profiler.stage('serialization'):
+                    if count == 1:
+                        f.write(open_array)
+                        f.write(serializer.array_item(pending))
+                    f.write(separator)
+                    f.write(serializer.array_item(dataset_json))
+            count += 1
+
+        with profiler.stage('serialization'):
+            if count == 0:
+                f.write(b'[]')
+            elif count == 1:
+                serializer.dump(pending, f)
+            else:
+                f.write(close_array)
+    return count
+
+
+def csv_to_dataverse_json(csv_file_path, output_json_path, defaults=None,
+                          stream=False, output_format='json', chunksize=None, workers=None,
+                          cache_dir=None, cache_max_bytes=1024 ** 3,
+                          json_backend='stdlib', indent=2, check_backends=False,
+                          profile_path=None, progress_interval=1.0, engine='pandas',
+                          validate_vocabulary=None, vocabulary_report='vocabulary_errors.jsonl',
+                          output_compression='infer', rows=None, ids=None, identifiers=None, writer_threads=8,
+                          diff_against=None, diff_output='metadata_diff.jsonl', return_datasets=True):
+    """
+    Convert CSV file to complete Dataverse JSON format.
+    Includes all top-level fields, datasetVersion, license, and metadata blocks.
+
+    With `stream=True` the CSV is read in chunks and each dataset is written as
+    soon as it is built, so memory stays flat regardless of input size; the
+    number of datasets written is returned instead of the data.
+    `output_format='jsonl'` writes one dataset per line. `output_format='sharded'`
+    treats `output_json_path` as a directory and writes one file per dataset
+    into a tree sharded by identifier, with a manifest, on `writer_threads`
+    threads (see sharded_output.ShardedWriter); the number of datasets is
+    returned.
+    Otherwise the datasets are held in their compact form while they are
+    written and returned as plain dicts afterwards; with
+    `return_datasets=False` they are never converted and only their number
+    is returned.
+    `workers` > 1 converts rows on a process pool; output order and fallback
+    IDs are the same as in a serial run.
+    `cache_dir` enables the on-disk row cache: rows unchanged since an earlier
+    run reuse their cached dataset JSON, generated identifiers included.
+    `json_backend` ('stdlib', 'orjson' or 'auto') and `indent` (None for
+    compact output) select the serializer; `check_backends` verifies that all
+    installed backends encode the output to the same data.
+    `profile_path` writes per-stage timings and counters as a stats JSON.
+    Progress is reported at most every `progress_interval` seconds.
+    `engine='csv'` reads the file with csv.DictReader instead of pandas, which
+    is never imported; cells are kept as text (no numeric type inference) and
+    the pandas default NA strings are treated as blank.
+    `validate_vocabulary` checks subject, language and country terms against
+    the block vocabularies before conversion: 'fail' raises VocabularyError at
+    the first bad chunk, 'skip' leaves out rows with invalid terms and 'report'
+    keeps them; every issue is written to `vocabulary_report` (JSON Lines).
+    The input may be gzip/bz2/xz/zstd compressed, Parquet or Arrow IPC (see
+    iter_csv_chunks). The output is compressed according to its suffix, or
+    `output_compression` ('gzip', 'bz2', 'xz', 'zstd' or None for plain).
+    `rows` (0-based data rows), `ids` and `identifiers` (cell values) convert
+    only the matching rows, read through a byte-offset index of the CSV that
+    is built on first use and rebuilt whenever the CSV changes.
+    `diff_against` (an earlier output file or sharded directory) compares the
+    metadata fields of every dataset with the dataset of the same identifier
+    there and writes edit payloads for the changed fields to `diff_output`
+    (see metadata_diff.MetadataDiff); the output itself is written as usual.
+    """
+    if output_format == 'sharded' and output_compression not in ('infer', None):
+        raise ValueError("Sharded output is written uncompressed")
+    if diff_against and os.path.abspath(diff_against) == os.path.abspath(output_json_path):
+        raise ValueError("Write the new output to another path than the output it is compared with")
+    serializer = JsonSerializer(json_backend, indent)
+    profiler = ConversionProfiler() if profile_path else NO_PROFILER
+    selected = None
+    if rows is not None or ids or identifiers:
+        from row_index import RowIndex
+        with RowIndex.open(csv_file_path) as index:
+            selected, missing = index.select(rows, ids, identifiers)
+        for criterion in missing:
+            print(f"⚠ No rows found for {criterion}")
+        print(f"✓ Row index: converting {len(selected)} of {index.rows} rows")
+    progress = ProgressReporter(estimate_row_count(csv_file_path) if selected is None else len(selected),
+                                interval=progress_interval)
+    validator = None
+    if validate_vocabulary:
+        from vocabulary import VocabularyValidator
+        validator = VocabularyValidator(REGISTRY, on_invalid=validate_vocabulary, report_path=vocabulary_report)
+    shard_writer = None
+    metadata_diff = None
+    if diff_against:
+        from metadata_diff import MetadataDiff
+        metadata_diff = MetadataDiff(diff_against, diff_output)
+        print(f"✓ Diff: indexed {len(metadata_diff.index)} datasets of {diff_against}")
+    cache = None
+    if cache_dir:
+        from row_cache import RowCache
+        # Edited block definitions change the output too, so they key the cache as well
+        cache = RowCache(cache_dir, f"{CONVERTER_VERSION}+{REGISTRY.fingerprint}", max_bytes=cache_max_bytes)
+
+    try:
+        datasets = _iter_datasets(csv_file_path, defaults, chunksize=chunksize, stream=stream,
+                                  workers=workers, cache=cache, profiler=profiler, progress=progress,
+                                  engine=engine, validator=validator, rows=selected,
+                                  with_rows=output_format == 'sharded' or metadata_diff is not None)
+        if metadata_diff is not None:
+            datasets = metadata_diff.observe(datasets)
+            if output_format != 'sharded':
+                datasets = (dataset_json for _, dataset_json in datasets)
+        if output_format == 'sharded':
+            from sharded_output import ShardedWriter
+            with ShardedWriter(output_json_path, serializer, threads=writer_threads, profiler=profiler) as shard_writer:
+                for row, dataset_json in datasets:
+                    if check_backends:
+                        check_serializers(dataset_json, indent)
+                    shard_writer.write(row, dataset_json)
+            total = output_data = shard_writer.datasets
+            progress.finish()
+        elif stream:
+            total = write_datasets_stream(datasets, output_json_path, output_format, serializer, check_backends, profiler,
+                                          output_compression)
+            output_data = total
+            progress.finish()
+        else:
+            all_datasets = list(datasets)
+            total = len(all_datasets)
+            progress.finish()
+
+            # Written one dataset at a time in the whole-document layout (a single
+            # object for one row, otherwise an array), never as one big string
+            write_datasets_stream(all_datasets, output_json_path, output_format, serializer, check_backends,
+                                  profiler, output_compression)
+            if return_datasets:
+                # Held and written compact; converted only now, in place, for the caller
+                for i, dataset_json in enumerate(all_datasets):
+                    all_datasets[i] = to_plain(dataset_json)
+                output_data = all_datasets[0] if output_format == 'json' and total == 1 else all_datasets
+            else:
+                output_data = total
+        diff_summary = metadata_diff.close() if metadata_diff is not None else None
+    except BaseException:
+        if metadata_diff is not None:
+            metadata_diff.abort()
+        raise
+    finally:
+        if cache is not None:
+            cache.close()
+        if validator is not None:
+            validator.close()
 
     print(f"\n✓ Successfully converted CSV to JSON: {output_json_path}")
-    print(f"✓ Total rows processed: {len(all_datasets)}")
+    print(f"✓ Total rows processed: {total}")
+    if shard_writer is not None:
+        print(f"✓ Manifest: {shard_writer.manifest_path} ({shard_writer.bytes / 1024 ** 2:.1f} MB in {total} files)")
+        if shard_writer.renamed:
+            print(f"⚠ {shard_writer.renamed} datasets repeat an earlier identifier; their files end in ~<row>.json")
+    if diff_summary is not None:
+        print(f"✓ Diff: {diff_summary['changed']} changed ({diff_summary['fields_changed']} fields), "
+              f"{diff_summary['unchanged']} unchanged, {diff_summary['new']} new")
+        if diff_summary['missing']:
+            print(f"⚠ {diff_summary['missing']} datasets of {diff_against} are not in this conversion")
+        print(f"✓ Edit payloads written to {diff_output}, summary to {metadata_diff.summary_path}")
+    if cache is not None:
+        stats = cache.stats()
+        print(f"✓ Row cache: {stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evicted")
+    if validator is not None:
+        stats = validator.stats()
+        if stats['issues']:
+            print(f"⚠ Vocabulary: {stats['issues']} invalid terms in {stats['rows_invalid']} rows "
+                  f"({stats['rows_skipped']} rows skipped), see {vocabulary_report}")
+        else:
+            print("✓ Vocabulary: all subject, language and country terms are valid")
+    if profiler.enabled:
+        report = profiler.write(profile_path)
+        print(f"✓ Profile written to {profile_path} ({report['rows_per_sec']} rows/sec)")
+        for name, stage in report['stages'].items():
+            print(f"    {name:<16} {stage['seconds']:>10.3f}s")
     return output_data
 
 
-def parse_compound(value, field_name, compound_fields):
+def parse_compound(value, field_name, compound_fields, type_classes=None):
     """
     Parse compound field values.
     Format: "value1; value2; value3 | value1; value2; value3"
+    `type_classes` maps subfields to their typeClass (default: primitive).
     """
+    return to_plain(_parse_compound(value, field_name, compound_fields, type_classes))
+
+
+def _parse_compound(value, field_name, compound_fields, type_classes=None):
+    """parse_compound() with the subfields kept as Field objects."""
     if field_name not in compound_fields:
         return []
 
@@ -394,12 +1391,9 @@ def parse_compound(value, field_name, compound_fields):
                     else:
                         continue  # Skip invalid dates
 
-                entry_obj[subfield] = {
-                    "typeName": subfield,
-                    "multiple": False,
-                    "typeClass": "primitive",
-                    "value": parts[i]
-                }
+                entry_obj[subfield] = Field(
+                    field_type(subfield, False, type_classes.get(subfield, "primitive") if type_classes else "primitive"),
+                    parts[i])
 
         if entry_obj:
             result.append(entry_obj)
@@ -407,87 +1401,118 @@ def parse_compound(value, field_name, compound_fields):
     return result
 
 
-def create_geospatial_block(row):
-    """Create geospatial metadata block if fields are present."""
-    geospatial = {
-        "displayName": "Geospatial Metadata",
-        "name": "geospatial",
-        "fields": []
-    }
-
-    # Geographic Coverage
-    if 'geographicCoverage' in row and row['geographicCoverage'] and not pd.isna(row['geographicCoverage']):
-        countries = [c.strip() for c in str(row['geographicCoverage']).split('|') if c.strip()]
-        geospatial["fields"].append({
-            "typeName": "geographicCoverage",
-            "multiple": True,
-            "typeClass": "compound",
-            "value": [{"country": {"typeName": "country", "multiple": False,
-                                   "typeClass": "controlledVocabulary", "value": c}} for c in countries]
-        })
-
-    # Geographic Unit
-    if 'geographicUnit' in row and row['geographicUnit'] and not pd.isna(row['geographicUnit']):
-        units = [u.strip() for u in str(row['geographicUnit']).split('|') if u.strip()]
-        geospatial["fields"].append({
-            "typeName": "geographicUnit",
-            "multiple": True,
-            "typeClass": "primitive",
-            "value": units
-        })
-
-    return geospatial if geospatial["fields"] else None
-
+def _build_metadata_block(block_plan, row, current_year):
+    """Build one non-citation metadata block from a compiled block plan, or None if it has no values."""
+    block_name, display_name, block_fields = block_plan
+    fields = FieldStore()
+    for field_name, ftype, _, builder in block_fields:
+        raw = row[field_name]
+        if not raw or is_missing(raw):
+            continue
+        value = builder(str(raw).strip(), current_year)
+        if value:
+            fields.add(Field(ftype, value))
 
-def create_socialscience_block(row):
-    """Create social science metadata block if fields are present."""
-    socialscience = {
-        "displayName": "Social Science and Humanities Metadata",
-        "name": "socialscience",
-        "fields": []
+    if not fields:
+        return None
+    return {
+        "displayName": display_name,
+        "name": block_name,
+        "fields": fields.to_list()
     }
 
-    # Simple fields mapping
-    simple_fields = {
-        'unitOfAnalysis': {'multiple': True, 'typeClass': 'primitive'},
-        'universe': {'multiple': True, 'typeClass': 'primitive'},
-        'timeMethod': {'multiple': False, 'typeClass': 'primitive'},
-        'frequencyOfDataCollection': {'multiple': False, 'typeClass': 'primitive'},
-        'samplingProcedure': {'multiple': False, 'typeClass': 'primitive'},
-        'collectionMode': {'multiple': True, 'typeClass': 'primitive'},
-        'dataCollectionSituation': {'multiple': False, 'typeClass': 'primitive'},
-        'weighting': {'multiple': False, 'typeClass': 'primitive'}
-    }
 
-    for field_name, config in simple_fields.items():
-        if field_name in row and row[field_name] and not pd.isna(row[field_name]):
-            field_entry = {
-                "typeName": field_name,
-                "multiple": config['multiple'],
-                "typeClass": config['typeClass']
-            }
+def create_metadata_block(block_name, row):
+    """Create the named registry metadata block for a row if any of its fields are present."""
+    block_plan = (block_name, REGISTRY.block(block_name)['displayName'],
+                  _plan_block_fields(block_name, frozenset(row.keys())))
+    return to_plain(_build_metadata_block(block_plan, row, datetime.now().strftime("%Y")))
 
-            if config['multiple']:
-                field_entry["value"] = [v.strip() for v in str(row[field_name]).split('|') if v.strip()]
-            else:
-                field_entry["value"] = str(row[field_name]).strip()
 
-            socialscience["fields"].append(field_entry)
+def create_geospatial_block(row):
+    """Create geospatial metadata block if fields are present."""
+    return create_metadata_block('geospatial', row)
 
-    return socialscience if socialscience["fields"] else None
+
+def create_socialscience_block(row):
+    """Create social science metadata block if fields are present."""
+    return create_metadata_block('socialscience', row)
 
 
 # Main execution
 if __name__ == "__main__":
 
     parser = argparse.ArgumentParser(description='Convert CSV to Dataverse JSON with optional defaults')
-    parser.add_argument('csv_input', nargs='?', default='Csv_to_json - Citation.csv', help='Input CSV file')
-    parser.add_argument('json_output', nargs='?', default='output_metadata.json', help='Output JSON file')
+    parser.add_argument('csv_input', nargs='?', default='Csv_to_json - Citation.csv',
+                        help='Input CSV file (optionally .gz/.bz2/.xz/.zst), or a .parquet/.arrow file')
+    parser.add_argument('json_output', nargs='?', default='output_metadata.json',
+                        help='Output JSON file; a .gz/.bz2/.xz/.zst suffix compresses it')
     parser.add_argument('--default-author', dest='default_author', help='Default author name if none provided')
     parser.add_argument('--default-email', dest='default_email', help='Default contact email if none provided')
     parser.add_argument('--default-description', dest='default_description', help='Default description if none provided')
+    parser.add_argument('--stream', action='store_true', help='Read the CSV in chunks and write each dataset as soon as it is built')
+    parser.add_argument('--jsonl', action='store_true', help='Write one dataset per line (JSON Lines) instead of a JSON array')
+    parser.add_argument('--sharded', action='store_true',
+                        help='Treat json_output as a directory and write one file per dataset, with a manifest')
+    parser.add_argument('--writer-threads', dest='writer_threads', type=int, default=8,
+                        help='Threads writing the files of --sharded output (default: 8)')
+    parser.add_argument('--diff-against', dest='diff_against', metavar='PREVIOUS',
+                        help='Compare with an earlier output (file or --sharded directory) and write edit payloads '
+                             'for the changed fields')
+    parser.add_argument('--diff-output', dest='diff_output', default='metadata_diff.jsonl',
+                        help='Edit payloads of --diff-against (default: metadata_diff.jsonl)')
+    parser.add_argument('--chunksize', type=int, default=None, help='Rows per chunk (default: 1000 when streaming, 500 with --workers)')
+    parser.add_argument('--workers', type=int, default=None, help='Convert rows on N worker processes (output order is preserved)')
+    parser.add_argument('--cache-dir', dest='cache_dir', help='Reuse converted rows from an on-disk cache in this directory')
+    parser.add_argument('--json-backend', dest='json_backend', choices=['stdlib', 'orjson', 'auto'], default='stdlib',
+                        help="JSON serializer: stdlib, orjson (pip install orjson) or auto (default: stdlib)")
+    parser.add_argument('--indent', type=int, default=2, help='Indentation of the JSON output (default: 2)')
+    parser.add_argument('--compact', action='store_true', help='Write JSON without any whitespace')
+    parser.add_argument('--check-backends', dest='check_backends', action='store_true',
+                        help='Verify that every installed JSON backend produces the same data')
+    parser.add_argument('--profile', nargs='?', const='conversion_stats.json', default=None,
+                        help='Write per-stage timings and counters to a stats JSON (default: conversion_stats.json)')
+    parser.add_argument('--engine', choices=['pandas', 'csv'], default='pandas',
+                        help='CSV reader: pandas, or csv for fast startup without pandas (default: pandas)')
+    parser.add_argument('--compress', choices=['gzip', 'bz2', 'xz', 'zstd', 'none'], default=None,
+                        help='Compress the output regardless of its suffix (default: from the suffix)')
+    parser.add_argument('--rows', help='Convert only these data rows, e.g. 5000-6000,7002 (1 = first row after the header)')
+    parser.add_argument('--id', dest='ids', action='append', metavar='ID',
+                        help='Convert only the row(s) with this id (repeatable)')
+    parser.add_argument('--identifier', dest='identifiers', action='append', metavar='IDENTIFIER',
+                        help='Convert only the row(s) with this identifier, e.g. FK2/ABC123 (repeatable)')
+    parser.add_argument('--cache-max-mb', dest='cache_max_mb', type=int, default=1024, help='Maximum row cache size in MB (default: 1024)')
+    parser.add_argument('--validate-vocabulary', dest='validate_vocabulary', nargs='?', const='fail',
+                        choices=['fail', 'skip', 'report'], default=None,
+                        help='Check subject, language and country terms before converting: stop at the first bad row '
+                             '(fail, default), leave bad rows out (skip) or only report them (report)')
+    parser.add_argument('--vocabulary-report', dest='vocabulary_report', default='vocabulary_errors.jsonl',
+                        help='Per-row vocabulary errors (default: vocabulary_errors.jsonl)')
+    parser.add_argument('--deposit', metavar='SERVER_URL',
+                        help='After converting, create each dataset on this Dataverse server (token from $DATAVERSE_API_TOKEN)')
+    parser.add_argument('--dataverse', default='root', help='Collection alias to deposit into (default: root)')
+    parser.add_argument('--deposit-concurrency', dest='deposit_concurrency', type=int, default=4,
+                        help='Deposit requests in flight (default: 4)')
+    parser.add_argument('--deposit-rate', dest='deposit_rate', type=float, default=None,
+                        help='Maximum deposit requests started per second')
+    parser.add_argument('--deposit-manifest', dest='deposit_manifest', default='deposit_manifest.jsonl',
+                        help='Per-row deposit results (default: deposit_manifest.jsonl)')
 
     args = parser.parse_args()
+    if args.sharded and args.jsonl:
+        parser.error('--sharded and --jsonl cannot be combined')
+    try:
+        JsonSerializer(args.json_backend, None if args.compact else args.indent)
+    except ValueError as e:
+        parser.error(str(e))
+
+    from row_index import parse_row_spec
+    from vocabulary import VocabularyError
+
+    try:
+        rows = parse_row_spec(args.rows) if args.rows else None
+    except ValueError as e:
+        parser.error(str(e))
 
     defaults = {}
     if args.default_author:
@@ -497,4 +1522,28 @@ if __name__ == "__main__":
     if args.default_description:
         defaults['description'] = args.default_description
 
-    csv_to_dataverse_json(args.csv_input, args.json_output, defaults=defaults)
+    try:
+        csv_to_dataverse_json(args.csv_input, args.json_output, defaults=defaults,
+                              stream=args.stream, output_format='sharded' if args.sharded else 'jsonl' if args.jsonl else 'json',
+                              chunksize=args.chunksize, workers=args.workers,
+                              cache_dir=args.cache_dir, cache_max_bytes=args.cache_max_mb * 1024 * 1024,
+                              json_backend=args.json_backend, indent=None if args.compact else args.indent,
+                              check_backends=args.check_backends, profile_path=args.profile, engine=args.engine,
+                              validate_vocabulary=args.validate_vocabulary, vocabulary_report=args.vocabulary_report,
+                              output_compression='infer' if args.compress is None else
+                              None if args.compress == 'none' else args.compress,
+                              rows=rows,
+                              ids=args.ids, identifiers=args.identifiers, writer_threads=args.writer_threads,
+                              diff_against=args.diff_against, diff_output=args.diff_output,
+                              return_datasets=False)
+    except VocabularyError as e:
+        print(f"⚠ {e}")
+        print(f"⚠ Conversion stopped; all errors of the failing rows are in {args.vocabulary_report}")
+        sys.exit(1)
+
+    if args.deposit:
+        from dataverse_deposit import deposit, load_datasets, print_summary
+        summary = deposit(load_datasets(args.json_output), args.deposit, args.dataverse,
+                          concurrency=args.deposit_concurrency, rate=args.deposit_rate,
+                          manifest_path=args.deposit_manifest)
+        print_summary(summary, args.deposit_manifest)
@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+"""
+Bulk deposit of converted datasets to the Dataverse native API.
+Each dataset is POSTed to /api/dataverses/{alias}/datasets through an asyncio
+HTTP/1.1 client that keeps a small pool of keep-alive connections open, with
+bounded concurrency and an optional request rate limit. Creating a dataset
+is not idempotent, so a request is only retried when the server cannot have
+acted on it: the connection could not be opened, or the server answered 429
+or 503 with Retry-After. One manifest line is written per input row.
+Only the standard library is used.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import ssl
+import time
+from urllib.parse import quote, urlsplit
+
+from metadata_fields import to_plain
+
+
+# datasetVersion keys the create-dataset endpoint accepts; the rest
+# (ids, version numbers, timestamps) are assigned by the server
+DEPOSIT_VERSION_KEYS = ('termsOfUse', 'citationRequirements', 'conditions', 'termsOfAccess',
+                        'license', 'fileAccessRequest', 'metadataBlocks')
+
+# Responses that reject the request unprocessed; retried when they carry Retry-After
+RETRY_STATUSES = frozenset({429, 503})
+
+API_TOKEN_ENV = 'DATAVERSE_API_TOKEN'
+
+
+class RequestNotSent(Exception):
+    """The request failed before any of it reached the server, so it is safe to send again."""
+
+
+def deposit_payload(dataset_json):
+    """Reduce a converted dataset to the body the create-dataset endpoint expects."""
+    version = dataset_json.get('datasetVersion', {})
+    return {"datasetVersion": {key: version[key] for key in DEPOSIT_VERSION_KEYS if key in version}}
+
+
+class RateLimiter:
+    """Token bucket allowing `rate` requests per second with bursts of up to `burst`."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class HttpConnectionPool:
+    """
+    Minimal asyncio HTTP/1.1 client for one host. Up to `size` keep-alive
+    connections are opened on demand and reused; a connection is dropped when
+    the server asks to close it, has closed it while idle, or a request on it
+    fails. Failures to connect raise RequestNotSent.
+    """
+
+    def __init__(self, base_url, size=4, timeout=60):
+        parts = urlsplit(base_url)
+        if parts.scheme not in ('http', 'https'):
+            raise ValueError(f"Unsupported URL scheme: {base_url}")
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.ssl = ssl.create_default_context() if parts.scheme == 'https' else None
+        self.prefix = parts.path.rstrip('/')
+        default_port = 443 if parts.scheme == 'https' else 80
+        self.host_header = self.host if self.port == default_port else f"{self.host}:{self.port}"
+        self.timeout = timeout
+        self.connections_opened = 0
+        self._idle = []
+        self._slots = asyncio.Semaphore(size)
+
+    async def request(self, method, path, body=b'', headers=None):
+        """Send one request and return (status, headers, body)."""
+        async with self._slots:
+            conn = self._idle_connection()
+            if conn is None:
+                try:
+                    conn = await self._open()
+                except (OSError, asyncio.TimeoutError) as e:
+                    raise RequestNotSent(f"{type(e).__name__}: {e}") from e
+            try:
+                status, response_headers, response_body = await asyncio.wait_for(
+                    self._roundtrip(conn, method, path, body, headers or {}), self.timeout)
+            except BaseException:
+                self._discard(conn)
+                raise
+            if response_headers.get('connection', '').lower() == 'close':
+                self._discard(conn)
+            else:
+                self._idle.append(conn)
+            return status, response_headers, response_body
+
+    def _idle_connection(self):
+        while self._idle:
+            conn = self._idle.pop()
+            if not conn[0].at_eof():
+                return conn
+            # Closed by the server while idle; sending on it would fail after the fact
+            self._discard(conn)
+        return None
+
+    async def close(self):
+        while self._idle:
+            self._discard(self._idle.pop())
+
+    async def _open(self):
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=self.ssl), self.timeout)
+        self.connections_opened += 1
+        return reader, writer
+
+    @staticmethod
+    def _discard(conn):
+        conn[1].close()
+
+    async def _roundtrip(self, conn, method, path, body, headers):
+        reader, writer = conn
+        lines = [f"{method} {self.prefix}{path} HTTP/1.1", f"Host: {self.host_header}",
+                 f"Content-Length: {len(body)}", "Connection: keep-alive"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError('Connection closed by server')
+        parts = status_line.split()
+        if len(parts) < 2 or not parts[1].isdigit():
+            raise ValueError(f"Malformed status line: {status_line[:100]!r}")
+        status = int(parts[1])
+        response_headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            parts = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                parts.append(await reader.readexactly(size))
+                await reader.readline()
+            response_body = b''.join(parts)
+        elif 'content-length' in response_headers:
+            response_body = await reader.readexactly(int(response_headers['content-length']))
+        else:
+            response_body = await reader.read()
+            response_headers['connection'] = 'close'
+        return status, response_headers, response_body
+
+
+def _retry_delay(attempt, backoff, headers):
+    """Seconds to wait before retry `attempt` (1-based): Retry-After, else jittered exponential."""
+    retry_after = headers.get('retry-after') if headers else None
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    return backoff * 2 ** (attempt - 1) * (0.5 + random.random())
+
+
+def _failed(status, attempt, error, may_have_been_created=False):
+    result = {'status': 'failed', 'http_status': status, 'attempts': attempt, 'error': error}
+    if may_have_been_created:
+        result['may_have_been_created'] = True
+    return result
+
+
+async def _deposit_one(pool, path, headers, dataset_json, limiter, retries, backoff):
+    """
+    POST one dataset; return the manifest fields for its row. Only requests
+    the server provably did not act on are retried (see RETRY_STATUSES and
+    RequestNotSent). A request that was sent but got no answer, or got 408 or
+    a 5xx error, may still have created the dataset: it is not repeated and
+    its row is marked may_have_been_created.
+    """
+    body = json.dumps(deposit_payload(to_plain(dataset_json)), ensure_ascii=False).encode('utf-8')
+    attempt = 0
+    while True:
+        attempt += 1
+        if limiter is not None:
+            await limiter.acquire()
+        response_headers = None
+        try:
+            status, response_headers, response_body = await pool.request('POST', path, body, headers)
+        except RequestNotSent as e:
+            status, error = None, str(e)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+            return _failed(None, attempt, f"{type(e).__name__}: {e}", may_have_been_created=True)
+        else:
+            if 200 <= status < 300:
+                try:
+                    data = json.loads(response_body or b'{}').get('data') or {}
+                except ValueError:
+                    data = {}
+                return {'status': 'created', 'http_status': status, 'attempts': attempt,
+                        'id': data.get('id'), 'persistentId': data.get('persistentId')}
+            error = response_body.decode('utf-8', 'replace')[:500]
+            if status not in RETRY_STATUSES or 'retry-after' not in response_headers:
+                return _failed(status, attempt, error, may_have_been_created=status == 408 or status >= 500)
+        if attempt > retries:
+            return _failed(status, attempt, error)
+        await asyncio.sleep(_retry_delay(attempt, backoff, response_headers))
+
+
+async def deposit_datasets(datasets, server_url, dataverse_alias, api_token=None, concurrency=4,
+                           rate=None, retries=3, backoff=0.5, timeout=60, manifest_path=None):
+    """
+    Create one Dataverse dataset per item of `datasets` (any iterable of
+    converted dataset JSON, consumed lazily) in the `dataverse_alias` collection.
+    At most `concurrency` requests are in flight and, with `rate`, at most
+    `rate` are started per second. Rows that could not be sent, or were
+    answered 429/503 with Retry-After, are retried up to `retries` times
+    (waiting as Retry-After asks, else with exponential backoff); nothing else
+    is resent, as the dataset may already exist.
+    `manifest_path` receives one JSON line per row as it finishes.
+    Returns a summary dict with counts and datasets/sec.
+    """
+    pool = HttpConnectionPool(server_url, size=concurrency, timeout=timeout)
+    limiter = RateLimiter(rate, burst=concurrency) if rate else None
+    path = f"/api/dataverses/{quote(dataverse_alias, safe='')}/datasets"
+    headers = {'Content-Type': 'application/json'}
+    api_token = api_token or os.getenv(API_TOKEN_ENV)
+    if api_token:
+        headers['X-Dataverse-key'] = api_token
+
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    counts = {'created': 0, 'failed': 0, 'may_have_been_created': 0}
+    manifest = open(manifest_path, 'w', encoding='utf-8') if manifest_path else None
+
+    async def worker():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            row, dataset_json = item
+            started = time.perf_counter()
+            try:
+                result = await _deposit_one(pool, path, headers, dataset_json, limiter, retries, backoff)
+            except Exception as e:
+                result = _failed(None, None, f"{type(e).__name__}: {e}", may_have_been_created=True)
+            counts[result['status']] += 1
+            counts['may_have_been_created'] += bool(result.get('may_have_been_created'))
+            if manifest is not None:
+                entry = {'row': row, 'identifier': dataset_json.get('identifier'), **result,
+                         'seconds': round(time.perf_counter() - started, 4)}
+                manifest.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    async def put(item):
+        """Queue `item`, re-raising the error of a worker that died instead of waiting forever."""
+        if not queue.full():
+            queue.put_nowait(item)
+            return
+        waiting = asyncio.ensure_future(queue.put(item))
+        while not waiting.done():
+            running = [task for task in tasks if not task.done()]
+            done, _ = await asyncio.wait([waiting, *running], return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task is not waiting and task.exception() is not None:
+                    waiting.cancel()
+                    raise task.exception()
+
+    start = time.perf_counter()
+    tasks = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+    try:
+        for row, dataset_json in enumerate(datasets):
+            await put((row, dataset_json))
+        for _ in tasks:
+            await put(None)
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await pool.close()
+        if manifest is not None:
+            manifest.close()
+
+    elapsed = time.perf_counter() - start
+    total = counts['created'] + counts['failed']
+    return {
+        'datasets': total,
+        'created': counts['created'],
+        'failed': counts['failed'],
+        'may_have_been_created': counts['may_have_been_created'],
+        'seconds': round(elapsed, 3),
+        'datasets_per_sec': round(total / elapsed, 1) if elapsed else 0.0,
+        'connections_opened': pool.connections_opened
+    }
+
+
+def deposit(datasets, server_url, dataverse_alias, **kwargs):
+    """Synchronous wrapper around deposit_datasets()."""
+    return asyncio.run(deposit_datasets(datasets, server_url, dataverse_alias, **kwargs))
+
+
+def load_datasets(json_path):
+    """
+    Yield the datasets of a converter output file (single object, JSON array
+    or JSON Lines, optionally compressed) or sharded output directory one at a time.
+    """
+    if os.path.isdir(json_path):
+        from sharded_output import iter_sharded_datasets
+        yield from iter_sharded_datasets(json_path)
+        return
+    from dataverse_json_to_csv import iter_json_documents
+    yield from iter_json_documents(json_path)
+
+
+def print_summary(summary, manifest_path=None):
+    print(f"✓ Deposited {summary['created']} of {summary['datasets']} datasets "
+          f"in {summary['seconds']}s ({summary['datasets_per_sec']} datasets/sec, "
+          f"{summary['connections_opened']} connections)")
+    if summary['failed']:
+        print(f"⚠ {summary['failed']} datasets failed" + (f", see {manifest_path}" if manifest_path else ''))
+    if summary.get('may_have_been_created'):
+        print(f"⚠ {summary['may_have_been_created']} of them got no clear answer and may have been created anyway; "
+              f"check the collection before depositing them again")
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Create Dataverse datasets from converter output')
+    parser.add_argument('json_input', help='Converter output file (JSON or JSON Lines, optionally compressed) or --sharded directory')
+    parser.add_argument('--server', required=True, help='Dataverse base URL, e.g. https://borealisdata.ca')
+    parser.add_argument('--dataverse', required=True, help='Alias of the collection to create the datasets in')
+    parser.add_argument('--api-token', dest='api_token', help=f'API token (default: ${API_TOKEN_ENV})')
+    parser.add_argument('--concurrency', type=int, default=4, help='Requests in flight (default: 4)')
+    parser.add_argument('--rate', type=float, default=None, help='Maximum requests started per second')
+    parser.add_argument('--retries', type=int, default=3, help='Retries per dataset (default: 3)')
+    parser.add_argument('--manifest', default='deposit_manifest.jsonl', help='Per-row result manifest (default: deposit_manifest.jsonl)')
+
+    args = parser.parse_args()
+
+    summary = deposit(load_datasets(args.json_input), args.server, args.dataverse, api_token=args.api_token,
+                      concurrency=args.concurrency, rate=args.rate, retries=args.retries,
+                      manifest_path=args.manifest)
+    print_summary(summary, args.manifest)
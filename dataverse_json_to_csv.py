@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""
+Dataverse JSON to CSV Converter
+Turns Dataverse dataset JSON (converter output, dataverse_json exports or
+native API responses) back into the CSV layout csv_to_dataverse_json.py
+reads, so datasets can be edited in a spreadsheet and converted again.
+Input is parsed incrementally: only one dataset is held in memory at a time.
+"""
+
+import argparse
+import csv
+import json
+import os
+
+from file_formats import open_text
+from metadata_blocks import default_registry
+
+
+TEMPLATE_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'TEMPLATE_CSV_WITH_ALL_COLUMNS.csv')
+
+# Blocks written as columns by default; fields of other blocks are counted as dropped
+DEFAULT_BLOCKS = ('citation', 'geospatial', 'socialscience')
+
+# System columns read by csv_to_dataverse_json, and where they live in the dataset JSON
+SYSTEM_COLUMN_PATHS = {
+    'id': ('id',),
+    'versionId': ('datasetVersion', 'id'),
+    'identifier': ('identifier',),
+    'protocol': ('protocol',),
+    'authority': ('authority',),
+    'publisher': ('publisher',),
+    'publicationDate': ('publicationDate',),
+    'datasetType': ('datasetType',),
+    'storageIdentifier': ('storageIdentifier',),
+    'versionNumber': ('datasetVersion', 'versionNumber'),
+    'internalVersionNumber': ('datasetVersion', 'internalVersionNumber'),
+    'versionMinorNumber': ('datasetVersion', 'versionMinorNumber'),
+    'versionState': ('datasetVersion', 'versionState'),
+    'latestVersionPublishingState': ('datasetVersion', 'latestVersionPublishingState'),
+    'fileAccessRequest': ('datasetVersion', 'fileAccessRequest'),
+    'UNF': ('datasetVersion', 'UNF'),
+    'lastUpdateTime': ('datasetVersion', 'lastUpdateTime'),
+    'releaseTime': ('datasetVersion', 'releaseTime'),
+    'createTime': ('datasetVersion', 'createTime'),
+    'citationDate': ('datasetVersion', 'citationDate'),
+    'termsOfUse': ('datasetVersion', 'termsOfUse'),
+    'citationRequirements': ('datasetVersion', 'citationRequirements'),
+    'conditions': ('datasetVersion', 'conditions'),
+    'termsOfAccess': ('datasetVersion', 'termsOfAccess'),
+    'licenseName': ('datasetVersion', 'license', 'name'),
+    'licenseUri': ('datasetVersion', 'license', 'uri'),
+    'licenseIconUri': ('datasetVersion', 'license', 'iconUri'),
+    'rightsIdentifier': ('datasetVersion', 'license', 'rightsIdentifier'),
+    'rightsIdentifierScheme': ('datasetVersion', 'license', 'rightsIdentifierScheme'),
+    'schemeUri': ('datasetVersion', 'license', 'schemeUri'),
+    'languageCode': ('datasetVersion', 'license', 'languageCode')
+}
+
+
+def iter_json_documents(json_path, read_size=1024 * 1024):
+    """
+    Yield the top-level JSON values of a file one at a time: the items of a
+    JSON array, a single object, or a sequence of objects (JSON Lines).
+    The file is read `read_size` characters at a time; a value larger than the
+    buffer just makes the next read bigger. Compressed files (.gz, .bz2, .xz,
+    .zst) are decompressed as they are read.
+    """
+    decoder = json.JSONDecoder()
+    with open_text(json_path, encoding='utf-8') as f:
+        buffer = f.read(read_size)
+        pos = 0
+        in_array = None
+        eof = not buffer
+        while True:
+            # Skip whitespace and the array punctuation between values
+            while True:
+                while pos < len(buffer) and buffer[pos] in ' \t\r\n':
+                    pos += 1
+                if pos < len(buffer):
+                    char = buffer[pos]
+                    if in_array is None:
+                        in_array = char == '['
+                        if in_array:
+                            pos += 1
+                            continue
+                    if in_array and char in ',]':
+                        pos += 1
+                        continue
+                    break
+                if eof:
+                    return
+                buffer, pos = f.read(read_size), 0
+                eof = not buffer
+
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                more = f.read(max(read_size, len(buffer) - pos))
+                if not more:
+                    raise
+                buffer, pos = buffer[pos:] + more, 0
+                continue
+            if end == len(buffer) and not eof and not isinstance(value, (dict, list)):
+                # A bare number or literal may continue in the next read
+                more = f.read(read_size)
+                if more:
+                    buffer, pos = buffer[pos:] + more, 0
+                    continue
+                eof = True
+            yield value
+            pos = end
+
+
+def unwrap_dataset(document):
+    """Return the dataset of a converter/export document, a native API response or a bare version."""
+    if 'data' in document and 'status' in document:
+        document = document['data']
+    if 'metadataBlocks' in document and 'datasetVersion' not in document:
+        document = {'datasetVersion': document}
+    return document
+
+
+def template_columns(template_path=TEMPLATE_CSV):
+    """Column names of the template, without the ': subfield; ...' hints."""
+    with open(template_path, newline='', encoding='utf-8-sig') as f:
+        header = next(csv.reader(f))
+    return [col.split(':')[0].strip() for col in header]
+
+
+def csv_columns(registry=None, blocks=DEFAULT_BLOCKS, template_path=TEMPLATE_CSV):
+    """
+    Output header: the template columns in template order, then the other
+    system columns, then the remaining fields of `blocks` in registry order,
+    then `files` and `citation`.
+    """
+    registry = registry or default_registry()
+    columns = template_columns(template_path)
+    seen = set(columns)
+    extra = list(SYSTEM_COLUMN_PATHS)
+    for block_name in blocks:
+        extra.extend(field['name'] for field in registry.block(block_name)['fields'])
+    extra.extend(['files', 'citation'])
+    for col in extra:
+        if col not in seen:
+            seen.add(col)
+            columns.append(col)
+    return columns
+
+
+def _lookup(document, path):
+    value = document
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def encode_compound(entries, subfields):
+    """
+    Inverse of parse_compound(): 'a; b | a; b' with parts in subfield order.
+    Returns (text, lossy) where lossy is True if a part contains ';' or '|'.
+    """
+    encoded = []
+    lossy = False
+    for entry in entries:
+        parts = []
+        for subfield in subfields:
+            part = entry.get(subfield)
+            text = _cell(part.get('value') if isinstance(part, dict) else part).strip()
+            lossy = lossy or ';' in text or '|' in text
+            parts.append(text)
+        while parts and not parts[-1]:
+            parts.pop()
+        if parts:
+            encoded.append('; '.join(parts))
+    return ' | '.join(encoded), lossy
+
+
+def dataset_to_row(dataset_json, registry, columns, stats):
+    """Flatten one dataset into {column: text} for the CSV writer."""
+    dataset_json = unwrap_dataset(dataset_json)
+    present = set(columns)
+    row = {}
+    for col, path in SYSTEM_COLUMN_PATHS.items():
+        if col in present:
+            value = _lookup(dataset_json, path)
+            if col == 'licenseName' and isinstance(dataset_json.get('datasetVersion', {}).get('license'), str):
+                value = dataset_json['datasetVersion']['license']
+            row[col] = _cell(value)
+
+    version = dataset_json.get('datasetVersion', {})
+    for block_name, block in (version.get('metadataBlocks') or {}).items():
+        for field in block.get('fields', []):
+            name = field.get('typeName')
+            value = field.get('value')
+            if name not in present:
+                stats['fields_dropped'] += 1
+                continue
+            if field.get('typeClass') == 'compound':
+                subfields = registry.compound_fields.get(name) or list(dict.fromkeys(
+                    key for entry in (value if isinstance(value, list) else [value]) for key in entry))
+                text, lossy = encode_compound(value if isinstance(value, list) else [value], subfields)
+            elif isinstance(value, list):
+                items = [_cell(v).strip() for v in value]
+                lossy = any('|' in item for item in items)
+                text = ' | '.join(items)
+            else:
+                text, lossy = _cell(value), False
+            if lossy:
+                stats['lossy_fields'] += 1
+            row[name] = text
+
+    if 'files' in present and version.get('files'):
+        row['files'] = json.dumps(version['files'], ensure_ascii=False)
+    if 'citation' in present and dataset_json.get('citation'):
+        row['citation'] = _cell(dataset_json['citation'])
+    return row
+
+
+def dataverse_json_to_csv(json_path, csv_path, blocks=DEFAULT_BLOCKS, template_path=TEMPLATE_CSV):
+    """
+    Convert a Dataverse JSON file (array, single object or JSON Lines) to CSV,
+    one row per dataset, streaming both input and output.
+    Compound fields are written as 'sub1; sub2 | sub1; sub2' with subfields in
+    metadata-block order. Returns counters: datasets, fields_dropped (fields of
+    blocks not in `blocks`) and lossy_fields (values containing ';' or '|',
+    which do not survive the round trip).
+    """
+    registry = default_registry()
+    columns = csv_columns(registry, blocks, template_path)
+    stats = {'datasets': 0, 'fields_dropped': 0, 'lossy_fields': 0}
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=columns, restval='')
+        writer.writeheader()
+        for document in iter_json_documents(json_path):
+            writer.writerow(dataset_to_row(document, registry, columns, stats))
+            stats['datasets'] += 1
+    return stats
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Convert Dataverse JSON back to CSV')
+    parser.add_argument('json_input', help='Dataverse JSON file (array, single dataset or JSON Lines; may be compressed)')
+    parser.add_argument('csv_output', help='Output CSV file')
+    parser.add_argument('--blocks', default=','.join(DEFAULT_BLOCKS),
+                        help=f"Metadata blocks to write as columns (default: {','.join(DEFAULT_BLOCKS)})")
+
+    args = parser.parse_args()
+
+    stats = dataverse_json_to_csv(args.json_input, args.csv_output, blocks=tuple(args.blocks.split(',')))
+    print(f"✓ Successfully converted JSON to CSV: {args.csv_output}")
+    print(f"✓ Total datasets processed: {stats['datasets']}")
+    if stats['fields_dropped']:
+        print(f"⚠ {stats['fields_dropped']} fields of other metadata blocks were left out (see --blocks)")
+    if stats['lossy_fields']:
+        print(f"⚠ {stats['lossy_fields']} values contain ';' or '|' and will be split differently when converted back")
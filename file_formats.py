@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Compressed and columnar file formats for converter input and output.
+Compression is picked from the file suffix (.gz, .bz2, .xz, .zst) or, when
+reading, from the file's magic bytes, and is always streamed. Parquet and
+Arrow IPC files are read one record batch at a time with only the requested
+columns. gzip, bz2 and xz use the standard library; zstd needs the zstandard
+package and Parquet/Arrow input needs pyarrow.
+"""
+
+import bz2
+import gzip
+import io
+import lzma
+import os
+
+
+COMPRESSION_SUFFIXES = {'.gz': 'gzip', '.bz2': 'bz2', '.xz': 'xz', '.zst': 'zstd'}
+
+COMPRESSION_CHOICES = ('gzip', 'bz2', 'xz', 'zstd')
+
+MAGIC_NUMBERS = ((b'\x1f\x8b', 'gzip'), (b'BZh', 'bz2'), (b'\xfd7zXZ\x00', 'xz'), (b'\x28\xb5\x2f\xfd', 'zstd'))
+
+# Levels used when none is given; gzip 6 instead of its default 9 keeps up with the converter
+DEFAULT_LEVELS = {'gzip': 6, 'bz2': 9, 'xz': 6, 'zstd': 3}
+
+COLUMNAR_SUFFIXES = {'.parquet': 'parquet', '.pq': 'parquet', '.arrow': 'arrow', '.feather': 'arrow', '.ipc': 'arrow'}
+
+# Compressors are handed one small write per dataset; batch them up first
+WRITE_BUFFER_SIZE = 1 << 20
+
+
+def compression_for_path(path):
+    """Compression implied by the file suffix, or None."""
+    return COMPRESSION_SUFFIXES.get(os.path.splitext(os.fspath(path))[1].lower())
+
+
+def detect_compression(path):
+    """Compression of an existing file, from its suffix or else its magic bytes; None if plain."""
+    compression = compression_for_path(path)
+    if compression:
+        return compression
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(6)
+    except OSError:
+        return None
+    for magic, name in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return name
+    return None
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError("zstd compression requires the zstandard package (pip install zstandard)")
+    return zstandard
+
+
+def open_binary(path, mode='rb', compression='infer', level=None):
+    """
+    Open `path` for binary reading ('rb') or writing ('wb'), compressing or
+    decompressing on the fly. `compression` is 'infer' (from the suffix, or
+    the magic bytes when reading), None for plain files, or one of
+    COMPRESSION_CHOICES.
+    """
+    if compression == 'infer':
+        compression = detect_compression(path) if mode == 'rb' else compression_for_path(path)
+    if not compression:
+        return open(path, mode)
+    if compression not in COMPRESSION_CHOICES:
+        raise ValueError(f"Unknown compression: {compression}")
+
+    level = DEFAULT_LEVELS[compression] if level is None else level
+    if compression == 'gzip':
+        f = gzip.open(path, mode, compresslevel=level)
+    elif compression == 'bz2':
+        f = bz2.open(path, mode, compresslevel=level)
+    elif compression == 'xz':
+        f = lzma.open(path, mode, preset=level if mode == 'wb' else None)
+    else:
+        zstandard = _zstandard()
+        if mode == 'rb':
+            f = zstandard.open(path, 'rb')
+        else:
+            f = zstandard.open(path, 'wb', cctx=zstandard.ZstdCompressor(level=level))
+    if mode == 'wb':
+        f = io.BufferedWriter(f, buffer_size=WRITE_BUFFER_SIZE)
+    return f
+
+
+def open_text(path, compression='infer', encoding='utf-8-sig'):
+    """Open a possibly compressed text file for reading, with newline='' as the csv module expects."""
+    if compression == 'infer':
+        compression = detect_compression(path)
+    if not compression:
+        return open(path, 'r', newline='', encoding=encoding)
+    return io.TextIOWrapper(open_binary(path, 'rb', compression), encoding=encoding, newline='')
+
+
+def columnar_format(path):
+    """'parquet' or 'arrow' for columnar input files, else None."""
+    return COLUMNAR_SUFFIXES.get(os.path.splitext(os.fspath(path))[1].lower())
+
+
+def _pyarrow(file_format):
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ValueError(f"Reading {file_format} files requires the pyarrow package (pip install pyarrow)")
+    return pyarrow
+
+
+def _open_arrow(path):
+    pa = _pyarrow('arrow')
+    source = pa.memory_map(os.fspath(path), 'r')
+    try:
+        return pa.ipc.open_file(source)
+    except pa.ArrowInvalid:
+        source.seek(0)
+        return pa.ipc.open_stream(source)
+
+
+def columnar_schema_names(path):
+    """Column names of a Parquet or Arrow IPC file, read from its schema only."""
+    if columnar_format(path) == 'parquet':
+        return list(_pyarrow('parquet').parquet.read_schema(path).names)
+    return list(_open_arrow(path).schema.names)
+
+
+def columnar_row_count(path):
+    """Row count from the file metadata; None if the format does not record it."""
+    if columnar_format(path) == 'parquet':
+        return _pyarrow('parquet').parquet.ParquetFile(path).metadata.num_rows
+    reader = _open_arrow(path)
+    if hasattr(reader, 'num_record_batches'):
+        return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+    return None
+
+
+def iter_columnar_batches(path, columns=None, batch_size=1000):
+    """
+    Yield pyarrow RecordBatches of at most `batch_size` rows holding only
+    `columns` (all columns if None). Parquet column chunks that are not
+    requested are never read or decompressed.
+    """
+    if columnar_format(path) == 'parquet':
+        parquet_file = _pyarrow('parquet').parquet.ParquetFile(path)
+        yield from parquet_file.iter_batches(batch_size=batch_size, columns=columns)
+        return
+
+    reader = _open_arrow(path)
+    if hasattr(reader, 'num_record_batches'):
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    else:
+        batches = reader
+    for batch in batches:
+        if columns is not None:
+            batch = batch.select(columns)
+        for start in range(0, batch.num_rows, batch_size):
+            yield batch.slice(start, batch_size)
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+Metadata block registry built from Dataverse metadata-block TSV definitions.
+Each TSV in the blocks directory (the same format Dataverse loads with
+/api/admin/datasetfield/load) is compiled into per-block field tables:
+top-level fields with their typeClass and multiplicity, compound subfields in
+display order, and controlled vocabularies. The compiled form is cached as
+JSON in the user's cache directory and rebuilt only when a source file changes.
+"""
+
+import hashlib
+import json
+import os
+from functools import lru_cache
+
+
+BLOCKS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'metadatablocks')
+
+# Load order of the standard blocks; other TSVs in the directory follow alphabetically
+DEFAULT_BLOCKS = ('citation', 'geospatial', 'socialscience', 'astrophysics', 'biomedical', 'journal')
+
+# Directory for compiled registries (empty: no caching). They are never written next to
+# the TSVs, which may be read-only or inside site-packages
+CACHE_DIR_ENV = 'DATAVERSE_METADATA_BLOCKS_CACHE'
+
+# Bump whenever the compiled layout changes; invalidates existing caches
+REGISTRY_FORMAT = 1
+
+BLOCKS_DIR_ENV = 'DATAVERSE_METADATA_BLOCKS_DIR'
+
+
+def parse_block_tsv(path):
+    """
+    Parse one metadata-block TSV into {'name', 'displayName', 'fields', 'vocabularies'}.
+    Columns are looked up by their header names, so column order does not matter.
+    """
+    block = None
+    fields = []
+    vocabularies = {}
+    section = header = None
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            cells = line.rstrip('\r\n').split('\t')
+            if not any(cells):
+                continue
+            if cells[0] in ('#metadataBlock', '#datasetField', '#controlledVocabulary'):
+                section, header = cells[0], cells
+                continue
+            if cells[0].startswith('#'):
+                # Comment line
+                continue
+            row = dict(zip(header[1:], cells[1:]))
+            if section == '#metadataBlock':
+                block = {'name': row['name'], 'displayName': row.get('displayName', row['name'])}
+            elif section == '#datasetField':
+                fields.append(row)
+            elif section == '#controlledVocabulary':
+                # Cells past the named columns are alternate spellings of the value
+                alternates = [alt for alt in cells[len(header):] if alt]
+                vocabularies.setdefault(row['DatasetField'], []).append(
+                    [row['Value'], row.get('identifier', ''), alternates])
+    if block is None:
+        raise ValueError(f"No #metadataBlock section in {path}")
+    block['fields'] = fields
+    block['vocabularies'] = vocabularies
+    return block
+
+
+def _flag(value):
+    return str(value).strip().upper() == 'TRUE'
+
+
+def _display_order(field):
+    try:
+        return int(field.get('displayOrder', 0))
+    except ValueError:
+        return 0
+
+
+def compile_block(definition):
+    """
+    Compile a parsed block into the tables the converter dispatches on.
+    Fields keep their displayOrder; compound children are listed under their parent.
+    """
+    ordered = sorted(definition['fields'], key=_display_order)
+    children = {}
+    for field in ordered:
+        if field.get('parent'):
+            children.setdefault(field['parent'], []).append(field)
+
+    def type_class(field):
+        if field['name'] in children or field.get('fieldType') == 'none':
+            return 'compound'
+        return 'controlledVocabulary' if _flag(field.get('allowControlledVocabulary')) else 'primitive'
+
+    fields = []
+    subfield_type_classes = {}
+    for field in ordered:
+        if field.get('parent'):
+            subfield_type_classes[field['name']] = type_class(field)
+            continue
+        fields.append({
+            'name': field['name'],
+            'multiple': _flag(field.get('allowmultiples')),
+            'typeClass': type_class(field),
+            'fieldType': field.get('fieldType', 'text'),
+            'required': _flag(field.get('required')),
+            'subfields': [child['name'] for child in children.get(field['name'], [])]
+        })
+
+    return {
+        'name': definition['name'],
+        'displayName': definition['displayName'],
+        'fields': fields,
+        'subfieldTypeClasses': subfield_type_classes,
+        'vocabularies': definition['vocabularies']
+    }
+
+
+class MetadataBlockRegistry:
+    """Compiled metadata blocks, indexed by block name and by field name."""
+
+    def __init__(self, compiled):
+        self.blocks = {block['name']: block for block in compiled['blocks']}
+        self.fingerprint = compiled['fingerprint']
+        self.compound_fields = {}
+        self.type_classes = {}
+        self.vocabularies = {}
+        self.field_blocks = {}
+        for block in self.blocks.values():
+            for field in block['fields']:
+                self.field_blocks[field['name']] = block['name']
+                if field['subfields']:
+                    self.compound_fields[field['name']] = field['subfields']
+            self.type_classes.update(block['subfieldTypeClasses'])
+            self.vocabularies.update(block['vocabularies'])
+
+    def __contains__(self, block_name):
+        return block_name in self.blocks
+
+    def block(self, block_name):
+        return self.blocks[block_name]
+
+    def directory(self, block_name):
+        """{field: {typeName, multiple, typeClass}} for the top-level fields of a block."""
+        return {field['name']: {"typeName": field['name'], "multiple": field['multiple'], "typeClass": field['typeClass']}
+                for field in self.blocks[block_name]['fields']}
+
+
+def _block_sources(block_dir, names=None):
+    if names is None:
+        found = {name[:-4] for name in os.listdir(block_dir) if name.endswith('.tsv')}
+        names = [name for name in DEFAULT_BLOCKS if name in found] + sorted(found - set(DEFAULT_BLOCKS))
+    return [os.path.join(block_dir, f"{name}.tsv") for name in names]
+
+
+def _file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def default_cache_path(block_dir):
+    """
+    Cache file for the registry of `block_dir`: under $DATAVERSE_METADATA_BLOCKS_CACHE
+    if set (an empty value turns caching off, giving None), otherwise under
+    $XDG_CACHE_HOME or ~/.cache.
+    """
+    cache_dir = os.getenv(CACHE_DIR_ENV)
+    if cache_dir is None:
+        base = os.getenv('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        cache_dir = os.path.join(base, 'dataverse-csv-converter')
+    if not cache_dir:
+        return None
+    key = hashlib.sha256(os.path.abspath(block_dir).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, f"metadatablocks-{key}.json")
+
+
+def load_registry(block_dir=None, names=None, cache_path=None):
+    """
+    Load the metadata blocks of `block_dir` (default: the bundled definitions,
+    or $DATAVERSE_METADATA_BLOCKS_DIR). `names` limits and orders the blocks.
+
+    The compiled registry is reused from `cache_path` (default:
+    default_cache_path(block_dir)) while every source TSV has the same mtime
+    and size; when only the stamps changed, the content hashes decide. An
+    unwritable cache just means compiling on every load.
+    """
+    block_dir = block_dir or os.getenv(BLOCKS_DIR_ENV) or BLOCKS_DIR
+    cache_path = cache_path or default_cache_path(block_dir)
+    sources = _block_sources(block_dir, names)
+    stamps = []
+    for path in sources:
+        stat = os.stat(path)
+        stamps.append([os.path.basename(path), stat.st_mtime_ns, stat.st_size])
+
+    cached = None
+    if cache_path:
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            pass
+    if cached and cached.get('format') == REGISTRY_FORMAT:
+        if cached['stamps'] == stamps:
+            return MetadataBlockRegistry(cached)
+        if [s[0] for s in cached['stamps']] == [s[0] for s in stamps]:
+            digests = [_file_digest(path) for path in sources]
+            if cached['digests'] == digests:
+                cached['stamps'] = stamps
+                _write_cache(cache_path, cached)
+                return MetadataBlockRegistry(cached)
+
+    digests = [_file_digest(path) for path in sources]
+    compiled = {
+        'format': REGISTRY_FORMAT,
+        'stamps': stamps,
+        'digests': digests,
+        'fingerprint': hashlib.sha256(''.join(digests).encode('ascii')).hexdigest()[:16],
+        'blocks': [compile_block(parse_block_tsv(path)) for path in sources]
+    }
+    _write_cache(cache_path, compiled)
+    return MetadataBlockRegistry(compiled)
+
+
+def _write_cache(cache_path, compiled):
+    if not cache_path:
+        return
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(compiled, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+@lru_cache(maxsize=None)
+def default_registry():
+    """The registry for the default blocks directory, loaded once per process."""
+    return load_registry()
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+Field-level differences between freshly converted datasets and an earlier
+converter output, as minimal Dataverse edit payloads.
+The earlier output (a JSON/JSON Lines file or a --sharded directory) is read
+once into an index holding, per identifier, a short hash of every metadata
+field rather than the datasets themselves. Each new dataset's fields are
+hashed the same way and only fields whose hashes differ are written out, as
+bodies for the editMetadata (?replace=true) and deleteMetadata endpoints.
+Only metadataBlocks are compared; system fields, license and terms are not.
+"""
+
+import hashlib
+import json
+import os
+import sys
+from functools import partial
+
+from metadata_fields import Field
+
+
+# Bytes of BLAKE2b kept per field; collisions between two versions of one field are out of reach
+DIGEST_SIZE = 16
+
+
+def _canonical_encoder():
+    """Compact JSON bytes with sorted keys; orjson (about 4x faster) when installed."""
+    try:
+        import orjson
+    except ImportError:
+        encode = json.JSONEncoder(sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode
+        return lambda obj: encode(obj).encode('utf-8')
+    return partial(orjson.dumps, option=orjson.OPT_SORT_KEYS)
+
+
+# Digests are only compared within one run, so the encoder choice does not matter
+_canonical = _canonical_encoder()
+
+
+def field_digest(field):
+    """Hash of a metadata field (Field or field dict), independent of the key order of its dicts."""
+    if isinstance(field, Field):
+        field = field.to_json()
+    return hashlib.blake2b(_canonical(field), digest_size=DIGEST_SIZE).digest()
+
+
+def iter_fields(dataset_json):
+    """Yield the metadata fields of a dataset across all its blocks."""
+    blocks = (dataset_json.get('datasetVersion') or {}).get('metadataBlocks') or {}
+    for block in blocks.values():
+        yield from block.get('fields', [])
+
+
+def persistent_id(dataset_json):
+    """The dataset's persistent identifier, e.g. doi:10.5072/FK2/ABC123."""
+    version = dataset_json.get('datasetVersion') or {}
+    if version.get('datasetPersistentId'):
+        return version['datasetPersistentId']
+    if dataset_json.get('protocol') and dataset_json.get('authority'):
+        return (f"{dataset_json['protocol']}:{dataset_json['authority']}"
+                f"{dataset_json.get('separator', '/')}{dataset_json.get('identifier')}")
+    return dataset_json.get('identifier')
+
+
+class FieldHashIndex:
+    """
+    Field hashes per dataset identifier. Each dataset is stored as a shared,
+    sorted tuple of its field names plus one bytes object with their digests
+    (about DIGEST_SIZE bytes per field), so large catalogs fit in memory.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._layouts = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, identifier):
+        return identifier in self._entries
+
+    def add(self, identifier, digests):
+        """Record {typeName: digest} for a dataset; a repeated identifier replaces the earlier one."""
+        self._entries[identifier] = self.pack(digests)
+
+    def pack(self, digests):
+        names = tuple(sorted(digests))
+        names = self._layouts.setdefault(names, names)
+        return names, b''.join(digests[name] for name in names)
+
+    def get(self, identifier):
+        """The packed (names, digests) of a dataset, or None."""
+        return self._entries.get(identifier)
+
+    def identifiers(self):
+        return self._entries.keys()
+
+    @staticmethod
+    def unpack(packed):
+        names, blob = packed
+        return {name: blob[i * DIGEST_SIZE:(i + 1) * DIGEST_SIZE] for i, name in enumerate(names)}
+
+
+def build_index(previous_path):
+    """Index the field hashes of every dataset in an earlier converter output."""
+    from dataverse_deposit import load_datasets
+    index = FieldHashIndex()
+    for dataset_json in load_datasets(previous_path):
+        identifier = dataset_json.get('identifier')
+        if identifier:
+            index.add(identifier, {sys.intern(field['typeName']): field_digest(field)
+                                   for field in iter_fields(dataset_json)})
+    return index
+
+
+class MetadataDiff:
+    """
+    Compares converted datasets with `previous_path` and writes one JSON line
+    per new or changed dataset to `output_path`: its row, identifier,
+    persistentId, status ('changed' or 'new'), the added, changed and
+    removed field names, and for changed datasets an editMetadata body with
+    the added and changed fields plus, if fields were removed, a
+    deleteMetadata body with their previous values. `summary_path` receives
+    the counts and the identifiers of unchanged datasets (safe to skip), new
+    datasets and previous datasets that no longer appear.
+    """
+
+    def __init__(self, previous_path, output_path='metadata_diff.jsonl', summary_path=None):
+        self.previous_path = previous_path
+        self.output_path = output_path
+        self.summary_path = summary_path or f"{os.path.splitext(output_path)[0]}_summary.json"
+        self.index = build_index(previous_path)
+        self.counts = {'changed': 0, 'unchanged': 0, 'new': 0, 'fields_changed': 0}
+        self._seen = set()
+        self._unchanged = []
+        self._new = []
+        self._removed = {}
+        self._tmp_path = f"{output_path}.{os.getpid()}.tmp"
+        self._out = open(self._tmp_path, 'w', encoding='utf-8')
+
+    def observe(self, datasets):
+        """Compare each (row, dataset) pair and pass it on unchanged."""
+        for row, dataset_json in datasets:
+            self.compare(row, dataset_json)
+            yield row, dataset_json
+
+    def compare(self, row, dataset_json):
+        identifier = dataset_json.get('identifier')
+        self._seen.add(identifier)
+        previous = self.index.get(identifier)
+        fields = {field['typeName']: field for field in iter_fields(dataset_json)}
+        digests = {name: field_digest(field) for name, field in fields.items()}
+
+        if previous is None:
+            self.counts['new'] += 1
+            self._new.append(identifier)
+            self._write({'row': row, 'identifier': identifier, 'persistentId': persistent_id(dataset_json),
+                         'status': 'new', 'added': list(fields), 'changed': [], 'removed': []})
+            return
+        if self.index.pack(digests) == previous:
+            self.counts['unchanged'] += 1
+            self._unchanged.append(identifier)
+            return
+
+        old = FieldHashIndex.unpack(previous)
+        added = [name for name in digests if name not in old]
+        changed = [name for name in digests if name in old and digests[name] != old[name]]
+        removed = [name for name in old if name not in digests]
+        self.counts['changed'] += 1
+        self.counts['fields_changed'] += len(added) + len(changed) + len(removed)
+        entry = {'row': row, 'identifier': identifier, 'persistentId': persistent_id(dataset_json),
+                 'status': 'changed', 'added': added, 'changed': changed, 'removed': removed}
+        if added or changed:
+            entry['editMetadata'] = {'fields': [fields[name].to_json() if isinstance(fields[name], Field)
+                                                else fields[name] for name in added + changed]}
+        if removed:
+            self._removed[identifier] = set(removed)
+        self._write(entry)
+
+    def close(self):
+        """
+        Finish the edit payloads and write the summary. deleteMetadata bodies
+        need the previous values of removed fields, so the earlier output is
+        read a second time, for just those datasets, if any field was removed.
+        Returns the summary.
+        """
+        self._out.close()
+        if self._removed:
+            from dataverse_deposit import load_datasets
+            old_fields = {}
+            for dataset_json in load_datasets(self.previous_path):
+                names = self._removed.get(dataset_json.get('identifier'))
+                if names:
+                    old_fields[dataset_json['identifier']] = [field for field in iter_fields(dataset_json)
+                                                              if field['typeName'] in names]
+            with open(self._tmp_path, encoding='utf-8') as src, \
+                    open(f"{self._tmp_path}.removed", 'w', encoding='utf-8') as dst:
+                for line in src:
+                    entry = json.loads(line)
+                    if entry['status'] == 'changed' and entry['identifier'] in old_fields:
+                        entry['deleteMetadata'] = {'fields': old_fields[entry['identifier']]}
+                    dst.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            os.replace(f"{self._tmp_path}.removed", self._tmp_path)
+        os.replace(self._tmp_path, self.output_path)
+
+        missing = [identifier for identifier in self.index.identifiers() if identifier not in self._seen]
+        summary = {'previous': self.previous_path, 'previous_datasets': len(self.index), **self.counts,
+                   'missing': len(missing), 'unchanged_identifiers': self._unchanged,
+                   'new_identifiers': self._new, 'missing_identifiers': missing}
+        with open(self.summary_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        return summary
+
+    def abort(self):
+        self._out.close()
+        try:
+            os.remove(self._tmp_path)
+        except OSError:
+            pass
+
+    def _write(self, entry):
+        self._out.write(json.dumps(entry, ensure_ascii=False) + '\n')
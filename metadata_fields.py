@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Compact in-memory representation of Dataverse metadata fields.
+A converted dataset holds one Field per metadata field and per compound
+subfield. A Field stores only its value and a reference to a shared FieldType
+(typeName, multiple, typeClass), interned so that every row uses the same
+descriptor objects. Fields read like the Dataverse field dicts
+(`field['typeName']`, `field.get('value')`). Fields are internal to the
+converter: JSON encoders write them through encode_field(), one field at a
+time, and to_plain() gives the plain Dataverse dicts returned to callers.
+"""
+
+from functools import lru_cache
+
+
+# Keys of a Dataverse field dict
+FIELD_KEYS = frozenset(('typeName', 'multiple', 'typeClass', 'value'))
+
+
+class FieldType:
+    """Immutable typeName/multiple/typeClass triple shared by all fields of that type."""
+
+    __slots__ = ('type_name', 'multiple', 'type_class')
+
+    def __init__(self, type_name, multiple, type_class):
+        self.type_name = type_name
+        self.multiple = multiple
+        self.type_class = type_class
+
+    def __reduce__(self):
+        # Unpickled descriptors (e.g. from worker processes) are interned again
+        return field_type, (self.type_name, self.multiple, self.type_class)
+
+    def __repr__(self):
+        return f"FieldType({self.type_name!r}, {self.multiple!r}, {self.type_class!r})"
+
+
+@lru_cache(maxsize=None)
+def field_type(type_name, multiple, type_class):
+    """The shared FieldType for a typeName/multiple/typeClass triple."""
+    return FieldType(type_name, multiple, type_class)
+
+
+class Field:
+    """
+    One metadata field: a shared FieldType plus its value (a string, a list of
+    strings, or for compounds a list of {subfield: Field} entries).
+    """
+
+    __slots__ = ('type', 'value')
+
+    def __init__(self, ftype, value):
+        self.type = ftype
+        self.value = value
+
+    def __getitem__(self, key):
+        if key == 'value':
+            return self.value
+        if key == 'typeName':
+            return self.type.type_name
+        if key == 'multiple':
+            return self.type.multiple
+        if key == 'typeClass':
+            return self.type.type_class
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return key in FIELD_KEYS
+
+    def __eq__(self, other):
+        if isinstance(other, Field):
+            return self.type is other.type and self.value == other.value
+        if isinstance(other, dict):
+            return self.to_json() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return Field, (self.type, self.value)
+
+    def __repr__(self):
+        return f"Field({self.type.type_name!r}, {self.value!r})"
+
+    def to_json(self):
+        """The Dataverse field dict, compound subfields included."""
+        ftype = self.type
+        value = self.value
+        if ftype.type_class == 'compound' and isinstance(value, list):
+            value = [{name: sub.to_json() if isinstance(sub, Field) else sub for name, sub in entry.items()}
+                     if isinstance(entry, dict) else entry for entry in value]
+        return {"typeName": ftype.type_name, "multiple": ftype.multiple, "typeClass": ftype.type_class,
+                "value": value}
+
+
+def field_object_hook(obj):
+    """`object_hook` for json.loads that turns Dataverse field dicts back into Fields."""
+    if obj.keys() == FIELD_KEYS:
+        return Field(field_type(obj['typeName'], obj['multiple'], obj['typeClass']), obj['value'])
+    return obj
+
+
+def encode_field(obj):
+    """`default` hook for json.JSONEncoder and orjson.dumps: a Field as its Dataverse dict."""
+    if isinstance(obj, Field):
+        return obj.to_json()
+    raise TypeError(f"Object of type {obj.__class__.__name__} is not JSON serializable")
+
+
+def to_plain(obj):
+    """
+    `obj` with every Field written out as its Dataverse dict, ready for any
+    JSON encoder: a Field, a dataset, a metadata block, a compound entry
+    ({subfield: Field}) or a list of these. Only the containers holding
+    Fields are copied; the rest is shared with the original.
+    """
+    if isinstance(obj, Field):
+        return obj.to_json()
+    if isinstance(obj, list):
+        return [to_plain(item) for item in obj]
+    if not isinstance(obj, dict):
+        return obj
+    version = obj.get('datasetVersion')
+    if isinstance(version, dict) and 'metadataBlocks' in version:
+        blocks = {name: to_plain(block) for name, block in version['metadataBlocks'].items()}
+        return {**obj, 'datasetVersion': {**version, 'metadataBlocks': blocks}}
+    if isinstance(obj.get('fields'), list):
+        return {**obj, 'fields': [field.to_json() if isinstance(field, Field) else field for field in obj['fields']]}
+    if any(isinstance(value, Field) for value in obj.values()):
+        return {key: value.to_json() if isinstance(value, Field) else value for key, value in obj.items()}
+    return obj
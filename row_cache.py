@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+On-disk row cache for incremental re-conversion.
+Converted datasets are stored in SQLite keyed by a hash of the row's cell
+values, the conversion defaults and the converter version, so unchanged rows
+are reused as-is (including their generated identifiers and timestamps).
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+
+from metadata_fields import encode_field, field_object_hook
+
+
+CACHE_FILENAME = 'row_cache.sqlite'
+
+# Environment variables that change placeholder values in the output
+DEFAULT_ENV_VARS = ('DATAVERSE_DEFAULT_AUTHOR', 'DATAVERSE_DEFAULT_EMAIL', 'DATAVERSE_DEFAULT_DESCRIPTION')
+
+# Columns whose absence makes the output depend on the row position or on uuid4()
+POSITIONAL_COLUMNS = ('id', 'versionId', 'identifier')
+
+# Columns the converter passes through int(), so 1234.0 and 1234 give the same output
+INT_COLUMNS = ('id', 'versionId', 'versionNumber', 'internalVersionNumber', 'versionMinorNumber')
+
+
+class RowCache:
+    """
+    SQLite-backed cache of converted datasets with size-bounded LRU eviction.
+    Writes are batched and flushed every `batch_size` operations and on close().
+    """
+
+    def __init__(self, cache_dir, converter_version, max_bytes=1024 ** 3, batch_size=1000):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, CACHE_FILENAME)
+        self.converter_version = converter_version
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._pending_puts = []
+        self._pending_touches = []
+
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS rows ('
+            'key TEXT PRIMARY KEY, payload TEXT NOT NULL, size INTEGER NOT NULL, last_used INTEGER NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS rows_last_used ON rows (last_used)')
+        self._tick = (self._conn.execute('SELECT MAX(last_used) FROM rows').fetchone()[0] or 0) + 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def key_context(self, columns, defaults=None):
+        """Hash state shared by all rows of one run: header, defaults, env defaults, version."""
+        context = {
+            'version': self.converter_version,
+            'columns': list(columns),
+            'defaults': defaults or {},
+            'env': {name: os.getenv(name) for name in DEFAULT_ENV_VARS}
+        }
+        return hashlib.blake2b(json.dumps(context, sort_keys=True).encode('utf-8'), digest_size=16)
+
+    def row_keys(self, columns, values, index, defaults=None):
+        """
+        Return one cache key per row of a chunk (`values` is `DataFrame.values`).
+        Blank and NaN cells hash the same, and whole-number floats in INT_COLUMNS
+        hash as integers, so a blank cell that makes pandas read an id column as
+        floats leaves the other rows' keys unchanged. The row position is mixed
+        in when the row relies on generated values (the 1000+idx / 2000+idx
+        fallback IDs or a random identifier), so duplicate rows never share one
+        cached dataset.
+        """
+        base = self.key_context(columns, defaults)
+        id_positions = [i for i, col in enumerate(columns) if col in POSITIONAL_COLUMNS]
+        int_positions = [i for i, col in enumerate(columns) if col in INT_COLUMNS]
+        keys = []
+        for idx, row_values in zip(index, values):
+            cells = ['' if v is None or v != v else str(v) for v in row_values]
+            for i in int_positions:
+                v = row_values[i]
+                if isinstance(v, float) and v.is_integer():
+                    cells[i] = str(int(v))
+            h = base.copy()
+            h.update('\x1f'.join(cells).encode('utf-8'))
+            if len(id_positions) < len(POSITIONAL_COLUMNS) or any(not cells[i] for i in id_positions):
+                h.update(f'\x1e{idx}'.encode('utf-8'))
+            keys.append(h.hexdigest())
+        return keys
+
+    def get_many(self, keys):
+        """Return {key: dataset_json} for the keys found in the cache."""
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        for start in range(0, len(unique), 500):
+            batch = unique[start:start + 500]
+            placeholders = ','.join('?' * len(batch))
+            for key, payload in self._conn.execute(
+                    f'SELECT key, payload FROM rows WHERE key IN ({placeholders})', batch):
+                found[key] = json.loads(payload, object_hook=field_object_hook)
+
+        for key in keys:
+            if key in found:
+                self.hits += 1
+                self._pending_touches.append((self._next_tick(), key))
+            else:
+                self.misses += 1
+        self._maybe_flush()
+        return found
+
+    def put(self, key, dataset_json):
+        payload = json.dumps(dataset_json, ensure_ascii=False, default=encode_field)
+        self._pending_puts.append((key, payload, len(payload.encode('utf-8')), self._next_tick()))
+        self._maybe_flush()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0
+        }
+
+    def flush(self):
+        with self._conn:
+            if self._pending_puts:
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO rows (key, payload, size, last_used) VALUES (?, ?, ?, ?)',
+                    self._pending_puts)
+            if self._pending_touches:
+                self._conn.executemany('UPDATE rows SET last_used = ? WHERE key = ?', self._pending_touches)
+        self._pending_puts = []
+        self._pending_touches = []
+
+    def evict(self):
+        """Drop least recently used rows until the stored payloads fit in max_bytes."""
+        self.flush()
+        with self._conn:
+            cursor = self._conn.execute(
+                'DELETE FROM rows WHERE key IN ('
+                ' SELECT key FROM ('
+                '  SELECT key, SUM(size) OVER (ORDER BY last_used DESC, key) AS running FROM rows'
+                ' ) WHERE running > ?)',
+                (self.max_bytes,))
+            self.evictions += cursor.rowcount
+
+    def close(self):
+        if self._conn is None:
+            return
+        self.evict()
+        self._conn.close()
+        self._conn = None
+
+    def _next_tick(self):
+        self._tick += 1
+        return self._tick
+
+    def _maybe_flush(self):
+        if len(self._pending_puts) + len(self._pending_touches) >= self.batch_size:
+            self.flush()
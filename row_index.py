@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+"""
+Byte-offset row index for large CSV files.
+One pass over the raw bytes records where every row starts and ends (quoted
+cells spanning several lines included) and which rows hold each `id` and
+`identifier` value. The index is stored in SQLite next to the CSV, so later
+runs can read just the selected rows out of the memory-mapped file. It
+records the CSV's size and modification time and is rebuilt when they change.
+"""
+
+import codecs
+import csv
+import io
+import mmap
+import os
+import sqlite3
+
+
+INDEX_SUFFIX = '.rowindex.sqlite'
+
+# Bump whenever the index layout changes; invalidates existing indexes
+INDEX_FORMAT = 2
+
+# Columns whose values can be looked up in the index
+KEY_COLUMNS = ('id', 'identifier')
+
+# Rows parsed per batch while building, and row numbers per SQLite query
+BUILD_BATCH = 10000
+QUERY_BATCH = 500
+
+
+def parse_row_spec(spec):
+    """
+    Row numbers selected by a spec such as '5000-6000,7002': 1-based data rows
+    (the first row after the header is 1), ranges inclusive. Returns 0-based
+    row positions, sorted and without duplicates.
+    """
+    rows = set()
+    for part in str(spec).split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition('-')
+        try:
+            first = int(first)
+            last = int(last) if last else first
+        except ValueError:
+            raise ValueError(f"Invalid row range '{part}' (expected e.g. 5000-6000 or 7002)")
+        if first < 1 or last < first:
+            raise ValueError(f"Invalid row range '{part}': rows start at 1 and ranges must ascend")
+        rows.update(range(first - 1, last))
+    return sorted(rows)
+
+
+def _key(column, value):
+    """Lookup form of a key cell: stripped, and '1234.0' equal to '1234' for ids."""
+    value = str(value).strip()
+    if column == 'id':
+        try:
+            number = float(value)
+        except ValueError:
+            return value
+        if number.is_integer():
+            return str(int(number))
+    return value
+
+
+def iter_record_spans(f, offset=0):
+    """
+    Yield (start, end) byte offsets of each CSV record read from binary file
+    `f` positioned at `offset`. Quotes are read as the csv module and pandas
+    read them: a quote opens a quoted cell only at the start of a cell, a line
+    ending inside a quoted cell does not end the record, "" inside a quoted
+    cell is an escaped quote, and a quote anywhere else is a plain character.
+    Blank lines are skipped, as csv.DictReader and pandas skip them.
+    """
+    start = offset
+    in_quotes = False
+    for line in f:
+        offset += len(line)
+        if in_quotes or b'"' in line:
+            # A byte order mark is not part of the first cell
+            in_quotes = _ends_in_quotes(line[3:] if offset == len(line) and line.startswith(codecs.BOM_UTF8)
+                                        else line, in_quotes)
+            if in_quotes:
+                continue
+        if offset - start != len(line) or line not in (b'\n', b'\r\n'):
+            yield start, offset
+        start = offset
+    if offset > start:
+        # Unterminated quote: the rest of the file is one record, as for the csv module
+        yield start, offset
+
+
+def _ends_in_quotes(line, in_quotes):
+    """Whether a quoted cell is still open at the end of `line`, given whether one was open at its start."""
+    position = 0
+    while True:
+        position = line.find(b'"', position)
+        if position < 0:
+            return in_quotes
+        if in_quotes:
+            if line[position + 1:position + 2] == b'"':
+                position += 2
+                continue
+            in_quotes = False
+        elif position == 0 or line[position - 1] == 0x2C:
+            # A quote opens a quoted cell only at the start of a cell: the start of a
+            # record (a line that does not begin inside quotes) or right after a ','
+            in_quotes = True
+        position += 1
+
+
+class RowIndex:
+    """
+    Row offsets and key lookups for one CSV file; see RowIndex.open().
+    Rows are 0-based positions among the data rows, the numbering the
+    converter uses for fallback IDs.
+    """
+
+    def __init__(self, csv_path, conn):
+        self.csv_path = csv_path
+        self._conn = conn
+        meta = dict(conn.execute('SELECT key, value FROM meta'))
+        self.rows = int(meta['rows'])
+        self.header_end = int(meta['header_end'])
+        self.key_columns = [col for col in meta['key_columns'].split(',') if col]
+
+    @classmethod
+    def open(cls, csv_path, index_path=None, rebuild=False):
+        """
+        Open the index of `csv_path` (default location: the CSV path plus
+        INDEX_SUFFIX), building it first if it is missing, from an older
+        format, or stale because the CSV's size or modification time changed.
+        If the index cannot be written it is built in memory for this run.
+        """
+        from file_formats import columnar_format, detect_compression
+        if columnar_format(csv_path) or detect_compression(csv_path):
+            raise ValueError("Selecting rows needs an uncompressed CSV file")
+        index_path = index_path or f"{csv_path}{INDEX_SUFFIX}"
+        stat = os.stat(csv_path)
+        stamp = {'format': str(INDEX_FORMAT), 'size': str(stat.st_size), 'mtime_ns': str(stat.st_mtime_ns)}
+
+        if not rebuild and os.path.exists(index_path):
+            try:
+                conn = sqlite3.connect(index_path)
+                meta = dict(conn.execute('SELECT key, value FROM meta'))
+                if all(meta.get(key) == value for key, value in stamp.items()):
+                    return cls(csv_path, conn)
+                conn.close()
+            except sqlite3.DatabaseError:
+                pass
+
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        conn = None
+        try:
+            conn = sqlite3.connect(tmp_path)
+            _build_index(csv_path, conn, stamp)
+            conn.close()
+            os.replace(tmp_path, index_path)
+        except (sqlite3.OperationalError, OSError):
+            # Unwritable location: build in memory for this run only
+            if conn is not None:
+                conn.close()
+            _remove(tmp_path)
+            conn = sqlite3.connect(':memory:')
+            _build_index(csv_path, conn, stamp)
+            return cls(csv_path, conn)
+        except BaseException:
+            if conn is not None:
+                conn.close()
+            _remove(tmp_path)
+            raise
+        return cls(csv_path, sqlite3.connect(index_path))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self._conn.close()
+
+    def lookup(self, column, values):
+        """{value: [rows]} for the given values of a key column; values not found are left out."""
+        if column not in self.key_columns:
+            raise ValueError(f"The CSV has no '{column}' column to look up")
+        found = {}
+        for value in values:
+            rows = [row for (row,) in self._conn.execute(
+                'SELECT row FROM keys WHERE column = ? AND value = ? ORDER BY row', (column, _key(column, value)))]
+            if rows:
+                found[value] = rows
+        return found
+
+    def select(self, rows=None, ids=None, identifiers=None):
+        """
+        Rows matching any of the criteria: `rows` (0-based positions, see
+        parse_row_spec), `ids` and `identifiers` (cell values). Returns
+        (sorted rows, list of criteria that matched nothing).
+        """
+        selected = set()
+        missing = []
+        if rows:
+            in_range = [row for row in rows if row < self.rows]
+            selected.update(in_range)
+            if len(in_range) < len(rows):
+                missing.append(f"rows after {self.rows}")
+        for column, values in (('id', ids), ('identifier', identifiers)):
+            if values:
+                found = self.lookup(column, values)
+                for value in values:
+                    if value in found:
+                        selected.update(found[value])
+                    else:
+                        missing.append(f"{column} {value}")
+        return sorted(selected), missing
+
+    def header_text(self):
+        """The header record as text (BOM removed)."""
+        with open(self.csv_path, 'rb') as f:
+            return f.read(self.header_end).decode('utf-8-sig')
+
+    def iter_blocks(self, rows, block_rows=1000):
+        """
+        Yield (row numbers, CSV text) for the given rows in blocks of up to
+        `block_rows` rows, sliced out of the memory-mapped file. The text has
+        no header; every record but the last ends with a newline.
+        """
+        rows = list(rows)
+        if not rows:
+            return
+        with open(self.csv_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for start in range(0, len(rows), block_rows):
+                block = rows[start:start + block_rows]
+                spans = {}
+                for query_start in range(0, len(block), QUERY_BATCH):
+                    batch = block[query_start:query_start + QUERY_BATCH]
+                    placeholders = ','.join('?' * len(batch))
+                    spans.update((row, (begin, end)) for row, begin, end in self._conn.execute(
+                        f'SELECT row, start, end FROM rows WHERE row IN ({placeholders})', batch))
+                parts = []
+                for position, row in enumerate(block):
+                    begin, end = spans[row]
+                    record = mm[begin:end]
+                    # Only the file's last record can lack its newline; an unterminated
+                    # quoted cell there must not gain one
+                    if not record.endswith(b'\n') and position < len(block) - 1:
+                        record += b'\n'
+                    parts.append(record)
+                yield block, b''.join(parts).decode('utf-8')
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _build_index(csv_path, conn, stamp):
+    conn.executescript('''
+        DROP TABLE IF EXISTS meta;
+        DROP TABLE IF EXISTS rows;
+        DROP TABLE IF EXISTS keys;
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE rows (row INTEGER PRIMARY KEY, start INTEGER, end INTEGER);
+        CREATE TABLE keys (column TEXT, value TEXT, row INTEGER);
+    ''')
+    row = header_end = 0
+    key_positions = []
+    if int(stamp['size']):
+        with open(csv_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            spans = iter_record_spans(f)
+            header = next(spans, None)
+            if header is not None:
+                header_end = header[1]
+                columns = next(csv.reader([mm[:header_end].decode('utf-8-sig')]), [])
+                key_positions = [(col, columns.index(col)) for col in KEY_COLUMNS if col in columns]
+            while header is not None:
+                batch = []
+                for begin, end in spans:
+                    batch.append((row, begin, end))
+                    row += 1
+                    if len(batch) >= BUILD_BATCH:
+                        break
+                if not batch:
+                    break
+                conn.executemany('INSERT INTO rows VALUES (?, ?, ?)', batch)
+                # Every span must be exactly one record of the csv module, or rows would be misnumbered
+                text = b''.join(mm[begin:end] for _, begin, end in batch).decode('utf-8', 'replace')
+                records = list(csv.reader(io.StringIO(text, newline='')))
+                if len(records) != len(batch):
+                    raise ValueError(f"Could not index {csv_path}: rows {batch[0][0] + 1}-{batch[-1][0] + 1} hold "
+                                     f"{len(records)} CSV records, not {len(batch)}")
+                if key_positions:
+                    keys = []
+                    for (row_number, _, _), cells in zip(batch, records):
+                        for col, position in key_positions:
+                            if position < len(cells) and cells[position].strip():
+                                keys.append((col, _key(col, cells[position]), row_number))
+                    conn.executemany('INSERT INTO keys VALUES (?, ?, ?)', keys)
+
+    conn.execute('CREATE INDEX keys_lookup ON keys (column, value)')
+    meta = dict(stamp, rows=str(row), header_end=str(header_end),
+                key_columns=','.join(col for col, _ in key_positions))
+    conn.executemany('INSERT INTO meta VALUES (?, ?)', meta.items())
+    conn.commit()
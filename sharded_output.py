@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Per-dataset output: one JSON file per dataset in a directory tree sharded by
+identifier, plus a manifest.
+A dataset goes to <dir>/ab/cd/<identifier>.json, where ab and cd are the first
+hex digits of the SHA-1 of its identifier, so directories stay small even for
+millions of datasets. Files are written by a thread pool, each under a
+temporary name that is then renamed into place, so readers never see a
+partial file. manifest.jsonl lists the row, identifier, path, size and SHA-256
+of every file in row order; it is renamed into place once all files are
+written, so a complete manifest means a complete run.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+
+MANIFEST_FILENAME = 'manifest.jsonl'
+
+# Directory levels of two hex digits each: 256 ** 2 leaf directories
+SHARD_DEPTH = 2
+
+# Characters kept in file names; anything else becomes '_' ('FK2/ABC' -> 'FK2_ABC')
+_UNSAFE_CHARS = re.compile(r'[^A-Za-z0-9._-]+')
+
+# Longest file name stem, well below the usual 255-byte limit
+MAX_NAME_LENGTH = 160
+
+
+def shard_path(identifier, depth=SHARD_DEPTH):
+    """Relative path ('ab/cd/FK2_ABC123.json', always with '/') of the file for a dataset identifier."""
+    digest = hashlib.sha1(identifier.encode('utf-8')).hexdigest()
+    name = _UNSAFE_CHARS.sub('_', identifier).strip('._')[:MAX_NAME_LENGTH] or digest
+    return '/'.join([digest[2 * level:2 * level + 2] for level in range(depth)] + [f"{name}.json"])
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class ShardedWriter:
+    """
+    Writes datasets as individual files under `output_dir` and records them in
+    its manifest. Datasets are serialized by the caller's thread with
+    `serializer` (a JsonSerializer); checksums and file writes run on
+    `threads` writer threads, with at most four files per thread in flight.
+    Use as a context manager: the manifest is only published on success.
+    """
+
+    def __init__(self, output_dir, serializer, threads=8, depth=SHARD_DEPTH, profiler=None):
+        self.output_dir = output_dir
+        self.serializer = serializer
+        self.depth = depth
+        self.profiler = profiler
+        self.datasets = 0
+        self.bytes = 0
+        self.renamed = 0
+        self._threads = max(1, threads)
+        self._paths = set()
+        self._dirs = set()
+        self._pending = deque()
+
+        os.makedirs(output_dir, exist_ok=True)
+        self.manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+        self._manifest_tmp = f"{self.manifest_path}.{os.getpid()}.tmp"
+        self._manifest = open(self._manifest_tmp, 'w', encoding='utf-8')
+        self._executor = ThreadPoolExecutor(max_workers=self._threads, thread_name_prefix='shard-writer')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, row, dataset_json):
+        """Queue one dataset (`row` is its 0-based CSV row) for writing."""
+        identifier = dataset_json.get('identifier') or f"row-{row}"
+        path = shard_path(str(identifier), self.depth)
+        if path in self._paths:
+            # Repeated identifier: keep both datasets, the later one under its row number
+            path = f"{path[:-len('.json')]}~{row}.json"
+            self.renamed += 1
+        self._paths.add(path)
+
+        with self.profiler.stage('serialization') if self.profiler is not None else nullcontext():
+            data = self.serializer.dumps(dataset_json)
+        self._pending.append((row, identifier, path, self._executor.submit(self._write_file, path, data)))
+        while len(self._pending) >= self._threads * 4:
+            self._record(self._pending.popleft())
+
+    def close(self):
+        """Wait for all files, then publish the manifest. Returns the number of datasets written."""
+        while self._pending:
+            self._record(self._pending.popleft())
+        self._executor.shutdown()
+        self._manifest.close()
+        os.replace(self._manifest_tmp, self.manifest_path)
+        return self.datasets
+
+    def abort(self):
+        """Stop after the files in flight; the previous manifest (if any) is left as it was."""
+        for *_, future in self._pending:
+            future.cancel()
+        self._executor.shutdown()
+        self._manifest.close()
+        _remove(self._manifest_tmp)
+
+    def _write_file(self, path, data):
+        full_path = os.path.join(self.output_dir, *path.split('/'))
+        directory = os.path.dirname(full_path)
+        if directory not in self._dirs:
+            os.makedirs(directory, exist_ok=True)
+            self._dirs.add(directory)
+        tmp_path = f"{full_path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, full_path)
+        except BaseException:
+            _remove(tmp_path)
+            raise
+        return len(data), hashlib.sha256(data).hexdigest()
+
+    def _record(self, item):
+        row, identifier, path, future = item
+        size, checksum = future.result()
+        entry = {'row': row, 'identifier': identifier, 'path': path, 'size': size, 'sha256': checksum}
+        self._manifest.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self.datasets += 1
+        self.bytes += size
+
+
+def read_manifest(output_dir):
+    """Yield the manifest entries of a sharded output directory in row order."""
+    with open(os.path.join(output_dir, MANIFEST_FILENAME), encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_sharded_datasets(output_dir, verify=False):
+    """
+    Yield the datasets of a sharded output directory in manifest order.
+    With `verify`, each file's size and SHA-256 are checked against the
+    manifest first (ValueError on mismatch).
+    """
+    for entry in read_manifest(output_dir):
+        with open(os.path.join(output_dir, *entry['path'].split('/')), 'rb') as f:
+            data = f.read()
+        if verify and (len(data) != entry['size'] or hashlib.sha256(data).hexdigest() != entry['sha256']):
+            raise ValueError(f"{entry['path']} does not match the manifest")
+        yield json.loads(data)
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the bulk deposit client against a local mock Dataverse server.
+Run with: python -m pytest tests
+"""
+
+import asyncio
+import json
+import os
+import socket
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataverse_deposit import deposit_datasets  # noqa: E402
+
+
+def created(n):
+    return {'status': 201, 'body': {'status': 'OK', 'data': {'id': n, 'persistentId': f"doi:10.5072/FK2/T{n}"}}}
+
+
+class MockDataverse:
+    """
+    Keep-alive HTTP/1.1 server on localhost. `respond(n)` gives the answer to
+    the n-th POST (1-based): a dict with 'status' and optional 'headers',
+    'body' and 'delay' (seconds), or raw bytes to send as they are.
+    """
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.posts = 0
+        self.connections = 0
+        self.paths = []
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self._serve, '127.0.0.1', 0)
+        self.url = f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+        return self
+
+    async def __aexit__(self, *exc):
+        self.server.close()
+
+    async def _serve(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    return
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                await reader.readexactly(int(headers.get('content-length', 0)))
+                self.posts += 1
+                self.paths.append(request_line.split()[1].decode())
+                answer = self.respond(self.posts)
+                if isinstance(answer, bytes):
+                    writer.write(answer)
+                    await writer.drain()
+                    continue
+                await asyncio.sleep(answer.get('delay', 0))
+                body = json.dumps(answer.get('body', {})).encode()
+                head = [f"HTTP/1.1 {answer['status']} X", f"Content-Length: {len(body)}"]
+                head.extend(f"{name}: {value}" for name, value in answer.get('headers', {}).items())
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode() + body)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def datasets(count):
+    return [{'identifier': f"FK2/T{i}", 'datasetVersion': {'metadataBlocks': {}}} for i in range(count)]
+
+
+class DepositTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.manifest_path = os.path.join(self.tmp.name, 'manifest.jsonl')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def manifest(self):
+        with open(self.manifest_path, encoding='utf-8') as f:
+            return sorted((json.loads(line) for line in f), key=lambda entry: entry['row'])
+
+    async def deposit(self, url, items, **kwargs):
+        kwargs.setdefault('backoff', 0.01)
+        return await asyncio.wait_for(
+            deposit_datasets(items, url, 'my-collection', manifest_path=self.manifest_path, **kwargs), 20)
+
+    async def test_success_reuses_connections(self):
+        async with MockDataverse(created) as server:
+            summary = await self.deposit(server.url, datasets(20), concurrency=3)
+        self.assertEqual((summary['created'], summary['failed']), (20, 0))
+        self.assertEqual(server.posts, 20)
+        self.assertLessEqual(summary['connections_opened'], 3)
+        self.assertEqual(summary['connections_opened'], server.connections)
+        self.assertEqual(set(server.paths), {'/api/dataverses/my-collection/datasets'})
+        entries = self.manifest()
+        self.assertEqual([entry['row'] for entry in entries], list(range(20)))
+        self.assertTrue(all(entry['status'] == 'created' and entry['persistentId'] for entry in entries))
+
+    async def test_429_with_retry_after_is_retried(self):
+        def respond(n):
+            return {'status': 429, 'headers': {'Retry-After': '0'}} if n == 1 else created(n)
+
+        async with MockDataverse(respond) as server:
+            summary = await self.deposit(server.url, datasets(1))
+        self.assertEqual(summary['created'], 1)
+        self.assertEqual(server.posts, 2)
+        self.assertEqual(self.manifest()[0]['attempts'], 2)
+
+    async def test_429_without_retry_after_fails(self):
+        async with MockDataverse(lambda n: {'status': 429}) as server:
+            summary = await self.deposit(server.url, datasets(1))
+        self.assertEqual(summary['failed'], 1)
+        self.assertEqual(server.posts, 1)
+        self.assertNotIn('may_have_been_created', self.manifest()[0])
+
+    async def test_server_errors_are_not_resent(self):
+        async with MockDataverse(lambda n: {'status': 500}) as server:
+            summary = await self.deposit(server.url, datasets(4), concurrency=2)
+        self.assertEqual(server.posts, 4)
+        self.assertEqual((summary['failed'], summary['may_have_been_created']), (4, 4))
+        self.assertTrue(all(entry['may_have_been_created'] for entry in self.manifest()))
+
+    async def test_client_error_fails_without_retry(self):
+        async with MockDataverse(lambda n: {'status': 400, 'body': {'message': 'bad'}}) as server:
+            summary = await self.deposit(server.url, datasets(2))
+        self.assertEqual((server.posts, summary['failed'], summary['may_have_been_created']), (2, 2, 0))
+        self.assertIn('bad', self.manifest()[0]['error'])
+
+    async def test_timeout_is_not_resent(self):
+        async with MockDataverse(lambda n: dict(created(n), delay=1.0)) as server:
+            summary = await self.deposit(server.url, datasets(6), concurrency=3, timeout=0.2)
+        self.assertEqual(server.posts, 6)
+        self.assertEqual((summary['failed'], summary['may_have_been_created']), (6, 6))
+        self.assertTrue(all(entry['error'].startswith('TimeoutError') for entry in self.manifest()))
+
+    async def test_malformed_status_line_fails_row(self):
+        async with MockDataverse(lambda n: b'GARBAGE\r\n\r\n') as server:
+            summary = await self.deposit(server.url, datasets(6), concurrency=1)
+        self.assertEqual(server.posts, 6)
+        self.assertEqual((summary['failed'], summary['may_have_been_created']), (6, 6))
+        self.assertIn('Malformed status line', self.manifest()[0]['error'])
+
+    async def test_connection_refused_is_retried(self):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        summary = await self.deposit(f"http://127.0.0.1:{port}", datasets(2), retries=2)
+        self.assertEqual((summary['failed'], summary['may_have_been_created']), (2, 0))
+        self.assertTrue(all(entry['attempts'] == 3 for entry in self.manifest()))
+
+    async def test_dead_worker_does_not_hang(self):
+        # Rows without .get() break the manifest write inside the worker
+        async with MockDataverse(created) as server:
+            with self.assertRaises(AttributeError):
+                await self.deposit(server.url, [[]] * 10, concurrency=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the row cache keys.
+Run with: python -m pytest tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from row_cache import RowCache  # noqa: E402
+
+
+COLUMNS = ['id', 'versionId', 'identifier', 'title', 'versionNumber', 'productionDate']
+
+
+class RowKeysTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = RowCache(self.tmp.name, 'test')
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def test_whole_float_ids_hash_as_integers(self):
+        ints = [[1234, 2234, 'FK2/A', 'a', 1, 1902]]
+        floats = [[1234.0, 2234.0, 'FK2/A', 'a', 1.0, 1902]]
+        self.assertEqual(self.cache.row_keys(COLUMNS, ints, [0]),
+                         self.cache.row_keys(COLUMNS, floats, [0]))
+
+    def test_fractional_and_other_columns_keep_their_text(self):
+        base = self.cache.row_keys(COLUMNS, [[1234, 2234, 'FK2/A', 'a', 1, 1902]], [0])
+        self.assertNotEqual(base, self.cache.row_keys(COLUMNS, [[1234.5, 2234, 'FK2/A', 'a', 1, 1902]], [0]))
+        self.assertNotEqual(base, self.cache.row_keys(COLUMNS, [[1234, 2234, 'FK2/A', 'a', 1, 1902.0]], [0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the byte-offset row index: every indexed row must be exactly one
+record of the csv module.
+Run with: python -m pytest tests
+"""
+
+import csv
+import io
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from row_index import RowIndex, iter_record_spans, parse_row_spec  # noqa: E402
+
+
+def csv_records(data):
+    """The data records (header and blank lines left out) the csv module reads from `data`."""
+    return [record for record in csv.reader(io.StringIO(data.decode('utf-8-sig'), newline='')) if record][1:]
+
+
+class RowIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, data, name='data.csv'):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def indexed_records(self, data):
+        """Every data row read back through the index, as csv module records."""
+        with RowIndex.open(self.write(data)) as index:
+            rows = list(range(index.rows))
+            records = []
+            for _, text in index.iter_blocks(rows, block_rows=3):
+                records.extend(csv.reader(io.StringIO(text, newline='')))
+            return index.rows, records
+
+    def assertMatchesCsvModule(self, data):
+        expected = csv_records(data)
+        rows, records = self.indexed_records(data)
+        self.assertEqual(rows, len(expected))
+        self.assertEqual(records, expected)
+
+    def test_multiline_cells(self):
+        self.assertMatchesCsvModule(b'id,title\n1,"two\nlines"\n2,"three\n\nlines, with ""quotes"""\n3,plain\n')
+
+    def test_crlf(self):
+        self.assertMatchesCsvModule(b'id,title\r\n1,"a\r\nb"\r\n2,c\r\n3,"d ""e"""\r\n')
+
+    def test_blank_lines(self):
+        self.assertMatchesCsvModule(b'id,title\n\n1,a\n\r\n\n2,"b\n\nc"\n\n3,d')
+
+    def test_stray_quotes_in_unquoted_cells(self):
+        data = b'id,title\n1,5" disk\n2,normal\n3,12" ruler\n4,last\n'
+        self.assertMatchesCsvModule(data)
+        with RowIndex.open(self.write(data)) as index:
+            self.assertEqual(index.select(parse_row_spec('2-3'))[0], [1, 2])
+            self.assertEqual(index.lookup('id', ['4']), {'4': [3]})
+            _, text = next(index.iter_blocks([1, 2]))
+        self.assertEqual(text, '2,normal\n3,12" ruler\n')
+
+    def test_quotes_after_cell_start_and_after_closing_quote(self):
+        self.assertMatchesCsvModule(b'a,b\nx "y,"z\n"q"r",s\n" t",u\n1,2\n')
+
+    def test_quoted_header_after_byte_order_mark(self):
+        self.assertMatchesCsvModule(b'\xef\xbb\xbf"id","two\nline title"\n1,a\n2,b\n')
+
+    def test_unterminated_quote_runs_to_end(self):
+        data = b'id,title\n1,"open\n2,b\n'
+        spans = list(iter_record_spans(io.BytesIO(data)))
+        self.assertEqual(spans, [(0, 9), (9, len(data))])
+        self.assertMatchesCsvModule(data)
+
+    def test_random_files_match_csv_module(self):
+        rng = random.Random(7)
+        pieces = ['a', 'b c', '"', '""', ',', '\n', '\r\n', ' ', '5"', 'é']
+        for _ in range(200):
+            rows = []
+            for _ in range(rng.randint(1, 6)):
+                cells = []
+                for _ in range(3):
+                    value = ''.join(rng.choice(pieces) for _ in range(rng.randint(0, 4)))
+                    cells.append(value if rng.random() < 0.5 else '"' + value.replace('"', '""') + '"')
+                rows.append(','.join(cells))
+            data = ('id,title,year\n' + '\n'.join(rows) + rng.choice(['', '\n'])).encode('utf-8')
+            expected = csv_records(data)
+            rows_indexed, records = self.indexed_records(data)
+            self.assertEqual((rows_indexed, records), (len(expected), expected), data)
+
+    def test_rebuilds_when_csv_changes(self):
+        path = self.write(b'id,title\n1,a\n')
+        with RowIndex.open(path) as index:
+            self.assertEqual(index.rows, 1)
+        with open(path, 'ab') as f:
+            f.write(b'2,b\n')
+        with RowIndex.open(path) as index:
+            self.assertEqual(index.rows, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
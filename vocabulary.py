@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Controlled-vocabulary validation for CSV chunks.
+Allowed terms come from the metadata block registry. Each vocabulary is
+indexed once by case-folded value, identifier and alternate spellings, with a
+trigram index for near-miss suggestions. Whole columns are checked per chunk,
+and each distinct cell is looked up only once per run.
+"""
+
+import json
+from contextlib import nullcontext
+from difflib import SequenceMatcher
+
+
+DEFAULT_FIELDS = ('subject', 'language', 'country')
+
+ON_INVALID_CHOICES = ('fail', 'skip', 'report')
+
+
+class VocabularyError(ValueError):
+    """Raised in 'fail' mode at the first chunk containing invalid terms."""
+
+    def __init__(self, issues):
+        first = issues[0]
+        super().__init__(f"Row {first['row'] + 1}: '{first['value']}' is not a valid {first['field']}"
+                         + (f" (did you mean '{first['suggestions'][0]}'?)" if first['suggestions'] else ''))
+        self.issues = issues
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class VocabularyIndex:
+    """Case-folded lookup and fuzzy suggestions for one controlled vocabulary."""
+
+    def __init__(self, field, entries):
+        self.field = field
+        self.values = [entry[0] for entry in entries]
+        self.exact = frozenset(self.values)
+        self.folded = {}
+        for value, identifier, alternates in entries:
+            for key in (value, identifier, *alternates):
+                if key:
+                    self.folded.setdefault(key.casefold(), value)
+
+        self._trigram_index = {}
+        for key, value in self.folded.items():
+            for gram in _trigrams(key):
+                self._trigram_index.setdefault(gram, set()).add(value)
+
+    def lookup(self, term):
+        """Return (canonical value or None, exact match)."""
+        if term in self.exact:
+            return term, True
+        return self.folded.get(term.casefold()), False
+
+    def suggest(self, term, limit=3, cutoff=0.6):
+        """Closest allowed values for a term that did not match."""
+        folded = term.casefold()
+        shared = {}
+        for gram in _trigrams(folded):
+            for value in self._trigram_index.get(gram, ()):
+                shared[value] = shared.get(value, 0) + 1
+        candidates = sorted(shared, key=lambda value: -shared[value])[:20]
+        scored = []
+        for value in candidates:
+            ratio = SequenceMatcher(None, folded, value.casefold()).ratio()
+            if ratio >= cutoff:
+                scored.append((ratio, value))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [value for _, value in scored[:limit]]
+
+
+class VocabularyValidator:
+    """
+    Checks the vocabulary-controlled columns of CSV chunks before conversion.
+
+    `fields` are controlled-vocabulary fields of the registry, either top-level
+    (`subject`, `language`) or compound subfields (`country` inside
+    `geographicCoverage`). `on_invalid` is 'fail' (raise VocabularyError at the
+    first bad chunk), 'skip' (drop rows with invalid terms) or 'report' (keep
+    them). Every issue is written to `report_path` as one JSON line.
+    """
+
+    def __init__(self, registry, fields=DEFAULT_FIELDS, on_invalid='fail', report_path=None):
+        if on_invalid not in ON_INVALID_CHOICES:
+            raise ValueError(f"on_invalid must be one of {', '.join(ON_INVALID_CHOICES)}")
+        self.on_invalid = on_invalid
+        self.report_path = report_path
+        self.indexes = {field: VocabularyIndex(field, registry.vocabularies[field])
+                        for field in fields if field in registry.vocabularies}
+
+        # column -> (field, subfield position or None, multiple)
+        self.targets = {}
+        for block in registry.blocks.values():
+            for field in block['fields']:
+                if field['name'] in self.indexes:
+                    self.targets[field['name']] = (field['name'], None, field['multiple'])
+                for position, subfield in enumerate(field['subfields']):
+                    if subfield in self.indexes:
+                        self.targets[field['name']] = (subfield, position, True)
+
+        self.issues = 0
+        self.rows_invalid = 0
+        self.rows_skipped = 0
+        self._verdicts = {}
+        self._report = open(report_path, 'w', encoding='utf-8') if report_path else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if self._report is not None:
+            self._report.close()
+            self._report = None
+
+    def _terms(self, cell, position, multiple):
+        """Vocabulary terms of a cell, split the way the converter splits it."""
+        text = str(cell).strip()
+        if position is None:
+            return [t.strip() for t in text.split('|') if t.strip()] if multiple else [text]
+        terms = []
+        for entry in text.split('|'):
+            parts = [p.strip() for p in entry.split(';')]
+            if position < len(parts) and parts[position] and parts[position].lower() != 'nan':
+                terms.append(parts[position])
+        return terms
+
+    def _verdict(self, field, term):
+        """None for a valid term, else (problem, suggestions); memoized per distinct term."""
+        key = (field, term)
+        if key not in self._verdicts:
+            index = self.indexes[field]
+            canonical, exact = index.lookup(term)
+            if exact:
+                verdict = None
+            elif canonical is not None:
+                verdict = ('not_canonical', [canonical])
+            else:
+                verdict = ('unknown', index.suggest(term))
+            self._verdicts[key] = verdict
+        return self._verdicts[key]
+
+    def validate_chunk(self, columns, values, index):
+        """Return the issues of one chunk (`values` is a row array), in row order."""
+        issues = []
+        for col_pos, col in enumerate(columns):
+            target = self.targets.get(col)
+            if target is None:
+                continue
+            field, position, multiple = target
+            # Distinct cells first, so repeated values cost one lookup
+            cell_terms = {}
+            for row_pos, row_values in enumerate(values):
+                cell = row_values[col_pos]
+                if cell is None or cell == "" or (isinstance(cell, float) and cell != cell):
+                    continue
+                if cell not in cell_terms:
+                    cell_terms[cell] = [(term, verdict) for term in self._terms(cell, position, multiple)
+                                        if (verdict := self._verdict(field, term)) is not None]
+                for term, (problem, suggestions) in cell_terms[cell]:
+                    issues.append({'row': index[row_pos], 'column': col, 'field': field, 'value': term,
+                                   'problem': problem, 'suggestions': suggestions})
+        issues.sort(key=lambda issue: issue['row'])
+        return issues
+
+    def filter_chunks(self, chunks, profiler=None):
+        """Validate each chunk before it is converted; drop or fail on bad rows per `on_invalid`."""
+        for chunk in chunks:
+            with profiler.stage('vocabulary') if profiler is not None else nullcontext():
+                issues = self.validate_chunk(list(chunk.columns), chunk.values, list(chunk.index))
+            if issues:
+                self._record(issues)
+                if self.on_invalid == 'fail':
+                    raise VocabularyError(issues)
+                if self.on_invalid == 'skip':
+                    bad_rows = {issue['row'] for issue in issues}
+                    keep = [pos for pos, idx in enumerate(chunk.index) if idx not in bad_rows]
+                    self.rows_skipped += len(chunk) - len(keep)
+                    chunk = chunk.take(keep)
+            yield chunk
+
+    def _record(self, issues):
+        self.issues += len(issues)
+        self.rows_invalid += len({issue['row'] for issue in issues})
+        if self._report is not None:
+            for issue in issues:
+                self._report.write(json.dumps(issue, ensure_ascii=False, default=int) + '\n')
+            self._report.flush()
+
+    def stats(self):
+        return {'issues': self.issues, 'rows_invalid': self.rows_invalid, 'rows_skipped': self.rows_skipped}